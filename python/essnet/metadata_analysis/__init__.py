@@ -0,0 +1,27 @@
+"""
+The metadata framework: variables, sets of included units, data sets, models and the A* search that combines data
+sets into a goal. The notebooks use it as
+    import metadata_analysis as md
+The user interface of the notebooks (widgets and printed tables) needs ipywidgets, IPython and pandas, it is only
+available when these are installed.
+"""
+
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.metadata.variable_spec import VariableSpec
+from metadata_analysis.metadata.aggregation import AggregationGraph, AggregationTable
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits, SetOfIncludedUnitsUnion
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.model import Model, ModelSingleUse
+from metadata_analysis.metadata.combining import combines
+from metadata_analysis.metadata.test_case import TestCase
+from metadata_analysis.algorithms.a_star import a_star
+
+try:
+    from metadata_analysis.ui.checkbox_data import CheckboxData
+    from metadata_analysis.ui.checkbox_model import CheckboxModel
+    from metadata_analysis.ui.dropdown import create_dropdown
+    from metadata_analysis.ui.output_prints import legend_print, path_print
+except ImportError:
+    pass
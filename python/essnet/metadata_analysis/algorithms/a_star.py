@@ -6,42 +6,107 @@ based on (a combination of) the similarity score function for data sources.
 """
 
 import copy
+import math
 import time
+import itertools
+import functools
+import contextlib
 import numpy as np
 
 from metadata_analysis.metadata.aggregation import AggregationGraph
-from metadata_analysis.metadata.variable import Variable
 from metadata_analysis.metadata.model import ModelSingleUse
 from metadata_analysis.metadata.path_step import Step
+from metadata_analysis.metadata.set_of_sources import INCREMENTAL_CHOICES
+from metadata_analysis.metadata.similarity_engine import SimilarityEngine, ENGINE_CHOICES
+from metadata_analysis.metadata.similarity_memo import SimilarityMemo
+from metadata_analysis.algorithms.search_lists import OpenList, ClosedList, BoundedClosedList, NeighbourList, \
+    NeighbourCache, StateTable, DominanceIndex, NeighbourStream
+from metadata_analysis.algorithms.parallel import ParallelExpander
+from metadata_analysis.algorithms.anytime import PartialResult
+from metadata_analysis.algorithms.checkpoint import save_checkpoint, load_checkpoint
+from metadata_analysis.algorithms.heuristic import GoalDistanceHeuristic
 
 
-def get_scores(similarity_choice, open_list, goal, variant="base", prints=False, score_function_parameter=None):
-    # from all possible variants for the available set of data sources, take the one with the highest similarity score
-    if similarity_choice == "sum":
-        all_scores = [temp_set.similarity_sum(goal, variant=variant) for temp_set in open_list]
+SIMILARITY_CHOICES = ["sum", "topsum", "max", "mean", "median", "min", "minmax", "maxmean", "maxmeanmin",
+                      "max_per_variable", "max_per_variable_bonus", "admissible"]
+
+# yielded by the search every yield_every iterations, so the caller can do other work in between (see a_star_async())
+PAUSE = object()
+
+
+def get_score(similarity_choice, temp_set, goal, variant="base", prints=False, score_function_parameter=None,
+              incremental=False, heuristic=None, models=None):
+    # similarity score of a single set of sources, using the similarity score function of choice
+    # incremental: derive the score from running aggregates (see SetOfSources.similarity_incremental()), for the
+    # similarity choices where this is possible
+    # heuristic: GoalDistanceHeuristic for the "admissible" choice (score_function_parameter is its weight), it is
+    # created from models (the models that can be used multiple times) if it is not given
+    if similarity_choice == "admissible":
+        if heuristic is None:
+            heuristic = _goal_distance_heuristic(goal, models, score_function_parameter)
+        return heuristic.score(temp_set)
+    elif incremental and similarity_choice in INCREMENTAL_CHOICES:
+        return temp_set.similarity_incremental(goal, similarity_choice=similarity_choice, variant=variant, prints=prints,
+                                               multiplier=score_function_parameter)
+    elif similarity_choice == "sum":
+        return temp_set.similarity_sum(goal, variant=variant)
     elif similarity_choice == "topsum":
-        all_scores = [temp_set.similarity_topsum(goal, variant=variant, prints=prints, multiplier=score_function_parameter) for temp_set in open_list]
+        return temp_set.similarity_topsum(goal, variant=variant, prints=prints, multiplier=score_function_parameter)
     elif similarity_choice == "max":
-        all_scores = [temp_set.similarity_max(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_max(goal, variant=variant)
     elif similarity_choice == "mean":
-        all_scores = [temp_set.similarity_mean(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_mean(goal, variant=variant)
     elif similarity_choice == "median":
-        all_scores = [temp_set.similarity_median(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_median(goal, variant=variant)
     elif similarity_choice == "min":
-        all_scores = [temp_set.similarity_min(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_min(goal, variant=variant)
     elif similarity_choice == "minmax":
-        all_scores = [temp_set.similarity_minmax(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_minmax(goal, variant=variant)
     elif similarity_choice == "maxmean":
-        all_scores = [temp_set.similarity_maxmean(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_maxmean(goal, variant=variant)
     elif similarity_choice == "maxmeanmin":
-        all_scores = [temp_set.similarity_maxmeanmin(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_maxmeanmin(goal, variant=variant)
     elif similarity_choice == "max_per_variable":
-        all_scores = [temp_set.similarity_max_per_variable(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_max_per_variable(goal, variant=variant)
     elif similarity_choice == "max_per_variable_bonus":
-        all_scores = [temp_set.similarity_max_per_variable_bonus(goal, variant=variant) for temp_set in open_list]
+        return temp_set.similarity_max_per_variable_bonus(goal, variant=variant)
     else: 
         print("No known similarity score option was chosen")
         return False
+
+
+def _goal_distance_heuristic(goal, models, score_function_parameter):
+    # without the models, goals that can only be reached with a model would get -inf (the bound is not admissible)
+    if models is None:
+        raise ValueError("The admissible similarity choice needs the models (or a GoalDistanceHeuristic).")
+    return GoalDistanceHeuristic(goal, models, weight=score_function_parameter)
+
+
+def get_scores(similarity_choice, open_list, goal, variant="base", prints=False, score_function_parameter=None,
+               incremental=False, engine=None, heuristic=None, memo=None, models=None):
+    # from all possible variants for the available set of data sources, take the one with the highest similarity score
+    # engine: SimilarityEngine, to score all sets of sources in the open list in a single (vectorised) call
+    # memo: SimilarityMemo, to score each distinct data source only once per goal (with the engine, if given)
+    if similarity_choice not in SIMILARITY_CHOICES:
+        print("No known similarity score option was chosen")
+        return False
+
+    if similarity_choice == "admissible" and heuristic is None:
+        # precompute the goal distances once for all sets of sources
+        heuristic = _goal_distance_heuristic(goal, models, score_function_parameter)
+
+    if memo is not None and similarity_choice in ENGINE_CHOICES:
+        return memo.score_sets(similarity_choice, list(open_list), goal, variant=variant, 
+                               multiplier=score_function_parameter, engine=engine)
+
+    if engine is not None and similarity_choice in ENGINE_CHOICES:
+        return engine.score_sets(similarity_choice, list(open_list), goal, variant=variant, 
+                                 multiplier=score_function_parameter)
+
+    all_scores = [get_score(similarity_choice, temp_set, goal, variant=variant, prints=prints, 
+                            score_function_parameter=score_function_parameter, incremental=incremental, 
+                            heuristic=heuristic) 
+                  for temp_set in open_list]
     
     return all_scores
 
@@ -56,7 +121,7 @@ def prep_rhs(start_set, goal):
 
     for data_source in start_set.set_of_sources:
         # for each of the data sources, we'll check if we can aggregate (some of) it's rhs variables to match the goal rhs
-        data_source_new = copy.deepcopy(data_source)
+        data_source_new = data_source  # each aggregation gives a new data set (see Data.apply_move())
         path_steps = []  # for explaining the step in the path, all aggregation details
 
         for v_r in data_source.right_variables:
@@ -65,11 +130,11 @@ def prep_rhs(start_set, goal):
             aggregation_graph = AggregationGraph.get(v_r.name)  # loop up corresponding aggregation graph
             connected_granularities = aggregation_graph.all_aggregations(v_r.granularity)
             for g in connected_granularities:
-                v2 = Variable(name=v_r.name, granularity = g)  # copy the name, but use the new granularity
+                v2 = v_r.with_granularity(g)  # copy the name, but use the new granularity
 
                 if v2 in goal.right_variables:
                     # a rhs variable of the goal is reached! 
-                    path_step_tmp = data_source_new.aggregate_variable(var_remove = v_r, var_add = v2)
+                    data_source_new, path_step_tmp = data_source_new.apply_move(("aggregation", v_r, v2))
                     # add to the method_detail for the path:
                     path_steps.append(path_step_tmp)
 
@@ -84,204 +149,482 @@ def prep_rhs(start_set, goal):
     return start_set_copy
 
 
-def a_star(start_set, goal, models, max_iteration, similarity_choice = "sum", prints=False, 
-          preprocess_rhs = False, find_multiple_paths=False, shedding=False, shedding_n = 10, variant="base", score_function_parameter=None):
+def _apply_single_use_models(models):
+    # applies each single use model once (they change the graphs), and returns the models that can be used 
+    # multiple times
+    models_multiple_use = []
+    for m in models:
+        if isinstance(m, ModelSingleUse):
+            m.apply()
+        else:
+            models_multiple_use.append(m)
+    return models_multiple_use
+
 
+def _a_star_search(start_set, goal, models, max_iteration, similarity_choice = "sum", prints=False, 
+          preprocess_rhs = False, find_multiple_paths=False, shedding=False, shedding_n = 10, variant="base", score_function_parameter=None,
+          incremental_scoring=False, similarity_engine=None, n_processes=None, beam_width=None, closed_list_size=None,
+          budget=None, neighbour_cache=None, prep_rhs_cache=None, checkpoint_path=None, checkpoint_interval=100,
+          resume_from=None, dominance_pruning=False, stats=None, profiler=None, yield_every=None,
+          lazy_neighbours=None, similarity_memo=None):
+
+    """
+    The A* search itself, as a generator: each solution is yielded as soon as it is found (only when 
+    find_multiple_paths is True), and the result of a_star() is the return value of the generator. If yield_every
+    is given, PAUSE is yielded every yield_every iterations as well.
+    """
     if prints: print("Starting A* function, goal:" + str(goal))
+
+    if similarity_choice not in SIMILARITY_CHOICES:
+        print("No known similarity score option was chosen")
+        return False
+    if lazy_neighbours is not None and (checkpoint_path is not None or resume_from is not None):
+        # the NeighbourStreams of the sets of sources that were put back are not saved in a checkpoint
+        raise ValueError("Checkpoints cannot be used with lazy_neighbours.")
     
     # initialize open and closed lists
-    open_list = []
-    closed_list = []
+    # the open list is a priority queue: each set of sources is scored once, when it is added
+    # both lists are hashed on the fingerprint of the sets of sources, for fast duplicate detection
+    # (optional) beam search: keep only the beam_width best sets of sources in the open list, and remember at most
+    # closed_list_size evaluated sets of sources. Shedding is the same as a beam search with width shedding_n.
+    if shedding:
+        beam_width = shedding_n
+    open_list = OpenList()
+    closed_list = ClosedList() if closed_list_size is None else BoundedClosedList(closed_list_size)
+    # (optional) lazy_neighbours: an expansion only adds the next lazy_neighbours new neighbours (the most promising 
+    # first, see NeighbourStream), and puts the set of sources back into the open list with its own score to take 
+    # the next ones later. streams holds the NeighbourStream of each set of sources that was put back.
+    streams = {}  # id(set of sources) -> NeighbourStream
     success_list = []
     current_set = start_set    # for printing update
     previous_score = -1
+    best_set = None  # evaluated set of sources with the highest score, for a partial result
+    best_score = None
+    start_iteration = 0
 
-    # Apply the single use models in models
-    models_multiple_use = []
-    for m in models:
-        if isinstance(m, ModelSingleUse):
-            # Apply the single use model once
-            m.apply()  
-        else:
-            # This model can be used multiple times, so add it to our new list
-            models_multiple_use.append(m)
+    if resume_from is not None:
+        # continue a search from a checkpoint (see save_checkpoint()), with the same goal, models and parameters
+        checkpoint = load_checkpoint(resume_from)
+        open_list = checkpoint["open_list"]
+        closed_list = checkpoint["closed_list"]
+        success_list = checkpoint["success_list"]
+        best_set = checkpoint["best_set"]
+        best_score = checkpoint["best_score"]
+        start_iteration = checkpoint["iteration"]
+        agg = checkpoint["agg"]
+        current_score = checkpoint["current_score"]
 
-    models = models_multiple_use  # overwrite models list  
+    if similarity_engine is True:
+        # use a similarity engine with the default weights
+        similarity_engine = SimilarityEngine()
+    if similarity_memo is True:
+        # keep the scores of the data sources of this search only
+        similarity_memo = SimilarityMemo()
 
+    # (optional) instrumentation: time spent in each phase of the search and counters are kept in stats (see 
+    # SearchStats), and the search (or some of its phases) can be profiled with cProfile and tracemalloc (see
+    # SearchProfiler)
+    def phase(name):
+        if stats is None and profiler is None:
+            return contextlib.nullcontext()
+        hooks = contextlib.ExitStack()
+        for hook in (stats, profiler):
+            if hook is not None:
+                hooks.enter_context(hook.phase(name))
+        return hooks
 
-    # Preprocessing: check for all rhs of data sources if they can be aggregated towards the goal rhs
-    if  preprocess_rhs:
-        # First make right-hand side variables of the start_set correspond to the goal, or terminate when 
-        # this is not possible
-        start_set_copy = prep_rhs(start_set, goal)
-        agg = False  # aggregation was prepared via prep_rhs() so give it zero priority until algorithm is completely stuck
-        open_list.append(start_set_copy)  # add start node
+    # "admissible": A* with the path length and a lower bound on the number of steps to the goal (see 
+    # GoalDistanceHeuristic), created after the single use models were applied
+    heuristic = None
 
-        if prints:
-            print("Preprocessed starting set of sources into: "+str(start_set_copy))    
+    def score_all(sets_of_sources):
+        # similarity scores of sets of sources, computed once when they are added to the open list
+        with phase("scoring"):
+            return get_scores(similarity_choice, sets_of_sources, goal, variant=variant, prints=prints,
+                              score_function_parameter=score_function_parameter, incremental=incremental_scoring, 
+                              engine=similarity_engine, heuristic=heuristic, memo=similarity_memo, models=models)
+
+    # (optional) dominance pruning: a new set is dropped if a set of sources in the open list, the closed list or 
+    # among the new neighbours dominates it (see DominanceIndex). This gives a much smaller open list, but may lose
+    # paths, for example when a model needs the exact data source that was dropped.
+    dominance_index = DominanceIndex() if dominance_pruning else None
+
+    def add_neighbour(new_set_tmp, new_sets):
+        # the new set is only kept if it is not already waiting to be evaluated (open_list), has also not been 
+        # evaluated yet (closed_list) and was not already found as a neighbour of the current set (new_sets)
+        with phase("duplicates"):
+            if stats is not None:
+                stats.count("generated")
+            if (new_set_tmp not in open_list) and (new_set_tmp not in closed_list) and (new_set_tmp not in new_sets):
+                if dominance_index is not None:
+                    if dominance_index.is_dominated(new_set_tmp):
+                        if stats is not None:
+                            stats.count("dominated")
+                        return False
+                    dominance_index.add(new_set_tmp)
+                new_sets.add(new_set_tmp)
+                return True
+            if stats is not None:
+                stats.count("duplicates")
+            return False
+
+    # Apply the single use models in models, only the models that can be used multiple times are kept
+    models = _apply_single_use_models(models)
+
+    if similarity_choice == "admissible":
+        heuristic = GoalDistanceHeuristic(goal, models, weight=score_function_parameter)
+
+
+    # (optional) find the neighbours with a pool of worker processes, they get the graphs and models once. This is
+    # set up after applying the single use models, because these change the graphs. An existing ParallelExpander 
+    # can also be given (it is then not shut down at the end).
+    if isinstance(n_processes, ParallelExpander):
+        expander = n_processes
+        own_expander = False
     else:
-        # No preprocessing of right hand side
-        agg = True
-        open_list.append(start_set)  # add start node
+        expander = ParallelExpander(n_processes, models) if n_processes else None
+        own_expander = True
+
+    def cached(set_of_sources, kind, find_neighbours):
+        # (optional) take the neighbours from the neighbour cache, if set_of_sources was expanded before
+        if neighbour_cache is None:
+            return find_neighbours()
+        result = neighbour_cache.get(set_of_sources, kind)
+        if result is None:
+            result = find_neighbours()
+            neighbour_cache.add(set_of_sources, kind, result)
+        return result
+
+    def neighbours_models(set_of_sources):
+        with phase("models"):
+            if expander is not None:
+                return cached(set_of_sources, "models", 
+                              lambda: expander.get_neighbours_models(set_of_sources, models=models))
+            return cached(set_of_sources, "models", lambda: set_of_sources.get_neighbours_models(models=models))
+
+    def neighbours(set_of_sources, agg):
+        with phase("regular"):
+            if expander is not None:
+                return cached(set_of_sources, ("regular", agg), 
+                              lambda: expander.get_neighbours(set_of_sources, agg=agg))
+            return cached(set_of_sources, ("regular", agg), lambda: set_of_sources.get_neighbours(agg=agg))
+
+    try:
+        if profiler is not None:
+            profiler.start()
+        # (optional) anytime search: stop when the time or memory budget runs out, or the search is cancelled
+        if budget is not None:
+            budget.start()
+        if stats is not None:
+            stats.start()
+
+        # Preprocessing: check for all rhs of data sources if they can be aggregated towards the goal rhs
+        if resume_from is not None:
+            # the start node was already added before the checkpoint was saved
+            if prints:
+                print("Resuming search at iteration " + str(start_iteration) + ".")
+        elif  preprocess_rhs:
+            # First make right-hand side variables of the start_set correspond to the goal, or terminate when 
+            # this is not possible
+            with phase("prep_rhs"):
+                if prep_rhs_cache is None:
+                    start_set_copy = prep_rhs(start_set, goal)
+                else:
+                    # prep_rhs() only depends on the right-hand side variables of the goal
+                    rhs_key = frozenset(goal.right_variables)
+                    if rhs_key not in prep_rhs_cache:
+                        prep_rhs_cache[rhs_key] = prep_rhs(start_set, goal)
+                    start_set_copy = prep_rhs_cache[rhs_key].shallow_copy()  # the search may add the goal to it
+            agg = False  # aggregation was prepared via prep_rhs() so give it zero priority until algorithm is completely stuck
+            open_list.push(start_set_copy, score_all([start_set_copy])[0])  # add start node
+
+            if prints:
+                print("Preprocessed starting set of sources into: "+str(start_set_copy))    
+        else:
+            # No preprocessing of right hand side
+            agg = True
+            open_list.push(start_set, score_all([start_set])[0])  # add start node
     
-    if prints:
-        print("Starting A* search.")
-        
-    # loop until we find the desired data set
-    for i in range(max_iteration):
+        if dominance_index is not None:
+            for set_of_sources in itertools.chain(open_list, closed_list):
+                dominance_index.add(set_of_sources)
+
         if prints:
-            print("--- Iteration "+str(i)+" ---")
-            print("   Length open list: "+ str(len(open_list)))
-            print("   Length closed list: "+ str(len(closed_list)))
+            print("Starting A* search.")
+        
+        # loop until we find the desired data set (without a maximum number of iterations, if max_iteration is None)
+        for i in (itertools.count(start_iteration) if max_iteration is None else range(start_iteration, max_iteration)):
+            if prints:
+                print("--- Iteration "+str(i)+" ---")
+                print("   Length open list: "+ str(len(open_list)))
+                print("   Length closed list: "+ str(len(closed_list)))
+            if yield_every is not None and i > start_iteration and (i - start_iteration) % yield_every == 0:
+                # (optional) give control back to the caller, for example to the event loop (see a_star_async())
+                yield PAUSE
+            if stats is not None:
+                stats.sample(i, open_list, closed_list)
+
+            if checkpoint_path is not None and i > start_iteration and i % checkpoint_interval == 0:
+                # (optional) save the search state, to resume from if the search is stopped
+                save_checkpoint(checkpoint_path, open_list, closed_list, success_list, i, agg, current_score, 
+                                best_set, best_score)
            
-        if i > 0:
-            previous_score = current_score
+            if i > 0:
+                previous_score = current_score
         
-        if len(open_list) == 0:
-            # If the open_list is completely empty, the algorithm has failed to find (the next) succesful path.
-            # Or all possible paths have been explored (some may have been lost if shedding was enabled).
+            if len(open_list) == 0:
+                # If the open_list is completely empty, the algorithm has failed to find (the next) succesful path.
+                # Or all possible paths have been explored (some may have been lost if shedding was enabled).
             
-            if find_multiple_paths:
-                if len(success_list) > 0:
-                    return success_list
+                if find_multiple_paths:
+                    if len(success_list) > 0:
+                        return success_list
             
-            end_message = "Open list was empty. Ran for " + str(i) + " iterations."            
-            if shedding:
-                end_message += " Shedding was used for "+str(shedding_n)+ " best branches. You could try again with more branches or no shedding."
-            else: 
-                end_message += " No more solutions will be found."
+                end_message = "Open list was empty. Ran for " + str(i) + " iterations."            
+                if beam_width is not None:
+                    end_message += " Shedding was used for "+str(beam_width)+ " best branches. You could try again with more branches or no shedding."
+                else: 
+                    end_message += " No more solutions will be found."
 
-            return end_message
-        
-        # From all possible neighbours (open_list) for the available set of data sources, take the one with the 
-        # highest similarity score
-        all_scores = get_scores(similarity_choice, open_list, goal, variant=variant, prints=prints, score_function_parameter=score_function_parameter)
+                return end_message
+
+            if budget is not None and (reason := budget.exceeded()):
+                # return the best set of sources so far, and the solutions that were already found
+                if prints:
+                    print("Stopping search: " + reason)
+                return PartialResult(best_set, best_score, success_list, reason, i, budget.elapsed())
         
-        # update current set
-        current_index = all_scores.index(max(all_scores))  # find highest scoring index
-        current_score = all_scores[current_index]  # update current score
-        current_set = open_list[current_index]  # update current set: take the one with highest score
-               
-        # (optional for speed up) keep only the best options in the open list
-        # this speeds up the search, but may lose potential solutions
-        if shedding & (len(open_list)>shedding_n):
-            top_indices = np.array(all_scores).argsort()[-shedding_n:][::-1]  # find highest scoring indices
-            open_list_new = [open_list[i] for i in top_indices]   # take the element with highest score
-            open_list = open_list_new
-
-        # pop current set off of the open list and add it to closed list
-        try: 
-            open_list.remove(current_set) 
-        except ValueError: 
-            # when shedding, it may occur that the current_set was already removed by the shedding
-            pass
-        closed_list.append(current_set)
+            # From all possible neighbours (open_list) for the available set of data sources, take the one with the 
+            # highest similarity score. Pop current set off of the open list
+            current_set, current_score = open_list.pop()
+            # (lazy_neighbours) a set of sources that was put back only needs the next neighbours of its stream
+            stream = streams.pop(id(current_set), None)
+            if stats is not None:
+                stats.count("expansions" if stream is None else "continuations")
+            if best_score is None or current_score > best_score:
+                best_set, best_score = current_set, current_score
        
-        if prints:
-            print("   Score of current set: " + str(current_score))
-            print("   Scores of previous set: ", previous_score)
-            if previous_score >= current_score:
-                print("  !! The score was not improved!!")
-            print("   Current set: \n" + str(current_set))
-            print("   Current set size: " + str(len(current_set.set_of_sources)))
-            print("   Path length: " + str(len(current_set.path)))
-            print("   Current path: " + str(current_set.path))
+            if prints:
+                print("   Score of current set: " + str(current_score))
+                print("   Scores of previous set: ", previous_score)
+                if previous_score >= current_score:
+                    print("  !! The score was not improved!!")
+                print("   Current set: \n" + str(current_set))
+                print("   Current set size: " + str(len(current_set.set_of_sources)))
+                print("   Path length: " + str(len(current_set.path)))
+                print("   Current path: " + str(current_set.path))
           
 
-        if False:
-            # check if the goal has been reached
-            if (current_set.contains(goal)):
+            if False:
+                # check if the goal has been reached
+                if (current_set.contains(goal)):
+                    # A valid path was found
+                    if find_multiple_paths:
+                        # User wants multiple valid paths, so save result and continue
+                        success_list.append(current_set)
+                    else:
+                        # User wants a single valid path, so return this path
+                        return current_set
+
+            # check if the goal has been reached (by equality), if not check if the goal is reached by shrinking 
+            # one of the sources in the current set. If so, this means we need a last step in the path: "contain"
+            # This happens in the contains_shrink() function
+            if stream is not None:
+                # the goal check was done, and the set is in the closed list, when it was expanded first
+                goal_found = False
+            else:
+                with phase("goal_test"):
+                    goal_found = current_set.contains(goal) or current_set.contains_shrink(goal)
+
+                # add current set to the closed list (after the goal check, because contains_shrink() may add the goal
+                # to the current set, which changes its fingerprint)
+                closed_list.add(current_set)
+                             
+            if goal_found:
                 # A valid path was found
                 if find_multiple_paths:
                     # User wants multiple valid paths, so save result and continue
                     success_list.append(current_set)
+                    if stats is not None:
+                        stats.count("solutions")
+                    yield current_set
                 else:
                     # User wants a single valid path, so return this path
+                    if stats is not None:
+                        stats.count("solutions")
                     return current_set
-
-        # check if the goal has been reached (by equality), if not check if the goal is reached by shrinking 
-        # one of the sources in the current set. If so, this means we need a last step in the path: "contain"
-        # This happens in the contains_shrink() function
-        goal_found = current_set.contains(goal) or current_set.contains_shrink(goal)
-                             
-        if goal_found:
-            # A valid path was found
-            if find_multiple_paths:
-                # User wants multiple valid paths, so save result and continue
-                success_list.append(current_set)
-            else:
-                # User wants a single valid path, so return this path
-                return current_set
         
-        # Identify all neighbours
-        n_neighbours_model = 0
-        n_neighbours_nonmodel = 0
+            # Identify all neighbours
+            n_neighbours_model = 0
+            n_neighbours_nonmodel = 0
+            new_sets = NeighbourList()  # new neighbours, they are scored and added to the open list after the expansion
         
-        # Modelling 
-        # If modelling is possible, we will try this first (it is usually a good idea to prioritise this)
-        # The neighbours found by modelling will be explored in the next step. Later, the non-modelling 
-        # neighbours can always be found again.
-        all_neighbours_mod, all_path_steps_mod = current_set.get_neighbours_models(
-            models=models)  # only modelling
+            if lazy_neighbours is not None:
+                with phase("lazy"):
+                    if stream is None:
+                        stream = NeighbourStream(current_set, goal, models, i)
+                    n_neighbours_model, n_neighbours_nonmodel = stream.take(
+                        lazy_neighbours, lambda new_set_tmp: add_neighbour(new_set_tmp, new_sets), phase=phase)
+            else:
+                # Modelling 
+                # If modelling is possible, we will try this first (it is usually a good idea to prioritise this)
+                # The neighbours found by modelling will be explored in the next step. Later, the non-modelling 
+                # neighbours can always be found again.
+                all_neighbours_mod, all_path_steps_mod = neighbours_models(current_set)  # only modelling
         
-        for neighbour, path_step in zip(all_neighbours_mod, all_path_steps_mod):
-            # each neighbour of the current set can be created and added to the set
-            new_set_tmp = copy.deepcopy(current_set)
-            new_set_tmp.add_data_source(neighbour, path_step, i)
-
-            if (new_set_tmp not in open_list) and (new_set_tmp not in closed_list):
-                # the new set is not already waiting to be evaluated (open_list) and has also not been 
-                # evaluated yet (closed_list)
-                open_list.append(new_set_tmp)
-                n_neighbours_model += 1
+                for neighbour, path_step in zip(all_neighbours_mod, all_path_steps_mod):
+                    # each neighbour of the current set can be created and added to the set
+                    # (shares the sources and path of the current set, see SetOfSources.branch())
+                    with phase("branching"):
+                        new_set_tmp = current_set.branch(neighbour, path_step, i)
+
+                    if add_neighbour(new_set_tmp, new_sets):
+                        n_neighbours_model += 1
         
-        if n_neighbours_model == 0:
-            # No models led to new results. So we will now check if combination, aggregation and conversion can be applied
-            all_neighbours_reg, all_path_steps_reg = current_set.get_neighbours(agg=agg)  # except modelling (and depending on agg, perhaps also without aggregation)
+                if n_neighbours_model == 0:
+                    # No models led to new results. So we will now check if combination, aggregation and conversion can be applied
+                    all_neighbours_reg, all_path_steps_reg = neighbours(current_set, agg)  # except modelling (and depending on agg, perhaps also without aggregation)
 
-            if agg==False & len(all_neighbours_reg)==0:
-                # if without aggregation there were no neighbours found, we will now try once with aggregation
-                all_neighbours_reg, all_path_steps_reg = current_set.get_neighbours(agg=True)  # except modelling
+                    if agg==False & len(all_neighbours_reg)==0:
+                        # if without aggregation there were no neighbours found, we will now try once with aggregation
+                        all_neighbours_reg, all_path_steps_reg = neighbours(current_set, True)  # except modelling
 
-            for neighbour, path_step in zip(all_neighbours_reg, all_path_steps_reg):
+                    for neighbour, path_step in zip(all_neighbours_reg, all_path_steps_reg):
    
-                # in some cases, models may result in a list of possible outputs
-                # we want to add each of these outputs as a separate neighbour
-                if isinstance(neighbour, list): 
-                    for neighbour_subdata in neighbour:
-                        # each neighbour of the current set can be created and added to the set
-                        new_set_tmp = copy.deepcopy(current_set)
-                        new_set_tmp.add_data_source(neighbour_subdata, path_step, i)
-
-                        if (new_set_tmp not in open_list) and (new_set_tmp not in closed_list):
-                            # the new set is not already waiting to be evaluated (open_list) and has also not
-                            # been evaluated yet (closed_list)
-                            open_list.append(new_set_tmp)
-                            n_neighbours_nonmodel += 1
-                else:
-                    # each neighbour of the current set can be created and added to the set
-                    new_set_tmp = copy.deepcopy(current_set)
-                    new_set_tmp.add_data_source(neighbour, path_step, i)
-
-                    if (new_set_tmp not in open_list) and (new_set_tmp not in closed_list):
-                        # the new set is not already waiting to be evaluated (open_list) and has also not 
-                        # been evaluated yet (closed_list)
-                        open_list.append(new_set_tmp)
-                        n_neighbours_nonmodel += 1
+                        # in some cases, models may result in a list of possible outputs
+                        # we want to add each of these outputs as a separate neighbour
+                        if isinstance(neighbour, list): 
+                            for neighbour_subdata in neighbour:
+                                # each neighbour of the current set can be created and added to the set
+                                with phase("branching"):
+                                    new_set_tmp = current_set.branch(neighbour_subdata, path_step, i)
+
+                                if add_neighbour(new_set_tmp, new_sets):
+                                    n_neighbours_nonmodel += 1
+                        else:
+                            # each neighbour of the current set can be created and added to the set
+                            with phase("branching"):
+                                new_set_tmp = current_set.branch(neighbour, path_step, i)
+
+                            if add_neighbour(new_set_tmp, new_sets):
+                                n_neighbours_nonmodel += 1
+
+            # Score all new neighbours (in a single call, when a similarity engine is used) and add them to the open list
+            new_sets_ordered = list(new_sets)
+            for new_set_tmp, new_score in zip(new_sets_ordered, score_all(new_sets_ordered)):
+                if heuristic is not None and new_score == -math.inf:
+                    # the goal cannot be reached from this set of sources (see GoalDistanceHeuristic)
+                    if stats is not None:
+                        stats.count("unreachable")
+                    continue
+                open_list.push(new_set_tmp, new_score)
+
+            if stream is not None and not stream.finished:
+                # (lazy_neighbours) take the next neighbours of the current set later
+                streams[id(current_set)] = stream
+                open_list.push(current_set, current_score)
+
+            # (optional for speed up) keep only the best options in the open list
+            # this speeds up the search and bounds the memory use, but may lose potential solutions
+            if beam_width is not None:
+                removed = open_list.shed(beam_width)
+                if stats is not None:
+                    stats.count("shed", len(removed))
+                for set_of_sources in removed:
+                    if streams.pop(id(set_of_sources), None) is not None:
+                        # a set of sources that was put back (lazy_neighbours) was explored, it stays in the index
+                        continue
+                    if dominance_index is not None:
+                        # sets of sources that are not explored should not dominate others
+                        dominance_index.remove(set_of_sources)
         
-        if prints:
-            print("   New neighbours: " + str(n_neighbours_model + n_neighbours_nonmodel)
-                + " (model: " + str(n_neighbours_model) + ", non-model: "+str(n_neighbours_nonmodel)+")")
+            if prints:
+                print("   New neighbours: " + str(n_neighbours_model + n_neighbours_nonmodel)
+                    + " (model: " + str(n_neighbours_model) + ", non-model: "+str(n_neighbours_nonmodel)+")")
 
-    if find_multiple_paths:
-        return success_list
-    else:
-        return {"Did not finish within " + str(max_iteration) + " iterations."}
+        if find_multiple_paths:
+            return success_list
+        else:
+            return {"Did not finish within " + str(max_iteration) + " iterations."}
+    finally:
+        if expander is not None and own_expander:
+            expander.shutdown()
+        if budget is not None:
+            budget.stop()
+        if stats is not None:
+            stats.stop()
+        if profiler is not None:
+            profiler.stop()
     
 
+@functools.wraps(_a_star_search)
+def a_star(*args, **kwargs):
+    # run the search until it is finished, and return its result (see _a_star_search() for all parameters)
+    search = _a_star_search(*args, **kwargs)
+    while True:
+        try:
+            next(search)
+        except StopIteration as stop:
+            return stop.value
+
+
+def a_star_solutions(start_set, goal, models, max_iteration, **kwargs):
+    """
+    Generator that yields each solution (a SetOfSources that contains the goal) as soon as it is found, so the
+    caller can stop after the first few solutions. A solution that consists of the same set of sources as an 
+    earlier solution (reached in a different order) is not yielded again. Other keyword arguments are passed to 
+    a_star(), find_multiple_paths is always True.
+    """
+    kwargs["find_multiple_paths"] = True
+    solutions = StateTable()
+    for solution in _a_star_search(start_set, goal, models, max_iteration, **kwargs):
+        if solution is not PAUSE and solution not in solutions:
+            solutions.add(solution)
+            yield solution
+
+
+def a_star_batch(start_set, goals, models, max_iteration, n_processes=None, **kwargs):
+    """
+    Runs a_star() for each goal in goals, with the same start set and models. Returns a list with the result of 
+    each goal. The single use models are applied once, the neighbours of each expanded set of sources are kept in 
+    a NeighbourCache that is shared by all goals, and prep_rhs() is only done once per right-hand side. With
+    similarity_memo=True, all goals share one SimilarityMemo. Other keyword arguments are passed to a_star().
+    """
+    # Apply the single use models once, and only pass on the models that can be used multiple times
+    models_multiple_use = _apply_single_use_models(models)
+
+    neighbour_cache = NeighbourCache()
+    prep_rhs_cache = {}
+    if kwargs.get("similarity_memo") is True:
+        # the scores are kept per goal, so the memo can be shared by all goals
+        kwargs["similarity_memo"] = SimilarityMemo()
+    expander = ParallelExpander(n_processes, models_multiple_use) if n_processes else None
+
+    results = []
+    try:
+        for goal in goals:
+            # the scores that are kept in the data sources are only valid for a single goal
+            start_set.reset_score()
+            for start_set_prepared in prep_rhs_cache.values():
+                start_set_prepared.reset_score()
+            for d in neighbour_cache.data():
+                d.reset_score()
+
+            # each goal starts from its own copy of the start set, because the search may add the goal to it
+            results.append(a_star(start_set.shallow_copy(), goal, models_multiple_use, max_iteration, 
+                                  n_processes=expander, neighbour_cache=neighbour_cache, prep_rhs_cache=prep_rhs_cache,
+                                  **kwargs))
+    finally:
+        if expander is not None:
+            expander.shutdown()
+
+    return results
+
+
 def simulate(n_simulations, start_set, goal, models, max_iteration, similarity_choice = "sum",
           preprocess_rhs = False, shedding=False, shedding_n = 10, variant="base", score_function_parameter=None):
-    """Do multiple a* algorithms to get an average mean score"""
+    """Do multiple a* algorithms to get an average mean score (see benchmark.py to run the cases over a grid of 
+    parameters, and to compare the results of two runs)"""
     
     t = time.perf_counter()
     times = np.zeros(n_simulations)
@@ -0,0 +1,75 @@
+"""
+# Anytime search
+A SearchBudget limits an A* search by wall-clock time and (optionally) by memory, and can be cancelled from another
+thread. When the budget runs out, a_star() stops and returns a PartialResult with the best set of sources that was
+evaluated so far and all solutions that were already found.
+"""
+
+import threading
+import time
+import tracemalloc
+
+
+class SearchBudget:
+    """
+    Budget for a single search. time_budget is in seconds, memory_budget in bytes (measured with tracemalloc, which
+    slows the search down somewhat). Both are optional. cancel() may be called from any thread.
+    """
+
+    def __init__(self, time_budget=None, memory_budget=None, cancel_event=None):
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        self.start_time = None
+        self.started_tracemalloc = False
+
+    def start(self):
+        # called by a_star() when the search starts
+        self.start_time = time.perf_counter()
+        if self.memory_budget is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+    def stop(self):
+        # called by a_star() when the search ends
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0
+        return time.perf_counter() - self.start_time
+
+    def exceeded(self):
+        # returns the reason why the search should stop, or None if there is budget left
+        if self.cancel_event.is_set():
+            return "cancelled"
+        if self.time_budget is not None and self.elapsed() > self.time_budget:
+            return "time budget of " + str(self.time_budget) + " seconds exceeded"
+        if self.memory_budget is not None and tracemalloc.is_tracing():
+            if tracemalloc.get_traced_memory()[0] > self.memory_budget:
+                return "memory budget of " + str(self.memory_budget) + " bytes exceeded"
+        return None
+
+
+class PartialResult:
+    """
+    Result of a search that was stopped by its SearchBudget. best_set is the evaluated set of sources with the
+    highest score (best_score), solutions holds the sets of sources that contain the goal (found so far).
+    """
+
+    def __init__(self, best_set, best_score, solutions, reason, iterations, elapsed):
+        self.best_set = best_set
+        self.best_score = best_score
+        self.solutions = solutions
+        self.reason = reason
+        self.iterations = iterations
+        self.elapsed = elapsed
+
+    def __str__(self):
+        return ("Search stopped after " + str(self.iterations) + " iterations (" + self.reason + "). Found " +
+                str(len(self.solutions)) + " solution(s), best score " + str(self.best_score) + ".")
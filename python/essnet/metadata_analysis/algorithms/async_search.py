@@ -0,0 +1,99 @@
+"""
+# Asynchronous search
+a_star_async() runs an A* search in an asyncio event loop without blocking it for the whole search: the search gives
+control back to the event loop every yield_every iterations, so many searches (and other tasks) can run in the
+same process. The search can be cancelled like any other task, also with a timeout:
+    result = await asyncio.wait_for(a_star_async(start_set, goal, models, 1000), timeout=10)
+A cancelled search is closed, so a ParallelExpander, SearchBudget, SearchStats or SearchProfiler that it uses is
+stopped as usual. To get the best set of sources found so far instead of an exception, use a SearchBudget with a
+time budget (see anytime.py).
+
+With an executor, the iterations between two pauses run in a thread of the executor (True: the default executor of
+the event loop), so the event loop can respond right away. The executor must be a thread pool, because the search
+itself cannot be sent to another process (use n_processes to find the neighbours in worker processes). A cancelled
+search stops at its next pause, yield_every is therefore also the largest number of iterations that are done after
+the cancellation.
+
+Searches that run at the same time need their own start set (for example a copy.deepcopy()), because the scores
+that are kept in the data sources are only valid for a single goal, and should not use single use models, because
+these change the graphs of all searches.
+"""
+
+import asyncio
+import inspect
+import threading
+
+from metadata_analysis.algorithms.a_star import _a_star_search, PAUSE
+from metadata_analysis.algorithms.search_lists import StateTable
+
+
+def _advance(search, lock):
+    # run the search until its next pause or solution, returns (pause or solution, False) or (result, True)
+    with lock:
+        try:
+            return next(search), False
+        except StopIteration as stop:
+            return stop.value, True
+
+
+def _close(search, lock):
+    with lock:
+        search.close()
+
+
+async def _step(search, executor, lock):
+    if executor is None:
+        # let the other tasks run first (this is also where the search can be cancelled)
+        await asyncio.sleep(0)
+        return _advance(search, lock)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None if executor is True else executor, _advance, search, lock)
+
+
+def _stop(search, executor, lock):
+    # close the search if it did not finish (it may still be running in a thread of the executor, then it is closed
+    # in the executor once it reaches its next pause)
+    if inspect.getgeneratorstate(search) == inspect.GEN_CLOSED:
+        return
+    if executor is None:
+        search.close()
+    else:
+        asyncio.get_running_loop().run_in_executor(None if executor is True else executor, _close, search, lock)
+
+
+async def a_star_async(start_set, goal, models, max_iteration, yield_every=10, executor=None, **kwargs):
+    """
+    Coroutine that runs a_star() and returns its result, giving control to the event loop every yield_every
+    iterations. executor: None to run the search in the event loop, True or a thread pool executor to run it in
+    threads. Other keyword arguments are passed to a_star().
+    """
+    search = _a_star_search(start_set, goal, models, max_iteration, yield_every=yield_every, **kwargs)
+    lock = threading.Lock()
+    try:
+        while True:
+            item, done = await _step(search, executor, lock)
+            if done:
+                return item
+    finally:
+        _stop(search, executor, lock)
+
+
+async def a_star_solutions_async(start_set, goal, models, max_iteration, yield_every=10, executor=None, **kwargs):
+    """
+    Asynchronous generator that yields each solution as soon as it is found, like a_star_solutions() (see
+    a_star_async() for yield_every and executor).
+    """
+    kwargs["find_multiple_paths"] = True
+    search = _a_star_search(start_set, goal, models, max_iteration, yield_every=yield_every, **kwargs)
+    lock = threading.Lock()
+    solutions = StateTable()
+    try:
+        while True:
+            item, done = await _step(search, executor, lock)
+            if done:
+                return
+            if item is not PAUSE and item not in solutions:
+                solutions.add(item)
+                yield item
+    finally:
+        _stop(search, executor, lock)
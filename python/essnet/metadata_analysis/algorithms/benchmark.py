@@ -0,0 +1,431 @@
+"""
+# Benchmarks
+Runs the cases that are shipped with the repository over a grid of search parameters, and records for each run the
+time, number of iterations, number of expanded sets of sources, peak memory and path length. The results can be
+saved as JSON or CSV, and two result files can be compared to find regressions (for example before and after a
+change of the search).
+
+The shipped cases are defined in notebooks. Each run executes the code cells of the notebook again, because the graphs are
+kept globally (and single use models change them), so every run starts from the same state. The cases of the
+article (python/jos_article/) use the classes and the A* implementation of the notebooks in that folder (imported
+with the ipynb package, like solve_cases.ipynb does). Their data sets have a context instead of a set of included
+units, so they cannot be searched with the A* of this package; the A* of the notebook is run with a SearchStats
+object instead (see _notebook_a_star()). The ESSnet case (python/essnet/case_essnet.ipynb) is run for each of its
+goals, with all potential data sources and models. The synthetic cases are generated catalogs (see
+generate_catalog()). A case whose notebooks need packages that are not installed (ipynb and matplotlib for the
+cases of the article, ipywidgets, IPython and pandas for the ESSnet case) is skipped by run_benchmark().
+
+With a profile folder, each test is also run once more with a SearchProfiler (the whole search, or only some of
+its phases), which writes a .pstats file and an allocation snapshot per run (see profiling.py).
+
+From the command line (in python/essnet/):
+    python -m metadata_analysis.algorithms.benchmark run --output results.json
+    python -m metadata_analysis.algorithms.benchmark run --cases case_essnet --output results.json --profile profiles
+    python -m metadata_analysis.algorithms.benchmark compare baseline.json results.json
+"""
+
+import argparse
+import csv
+import importlib.util
+import itertools
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+from metadata_analysis.metadata.synthetic_catalog import generate_catalog
+from metadata_analysis.algorithms.a_star import a_star as a_star_package
+from metadata_analysis.algorithms.profiling import SearchProfiler
+from metadata_analysis.algorithms.stats import SearchStats
+
+# folder with the folders essnet/ and jos_article/
+NOTEBOOK_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+DEFAULT_GRID = {
+    "similarity_choice": ["sum", "topsum"],
+    "variant": ["base", "individual"],
+    "shedding_n": [None, 10, 50],  # None: no shedding
+    "preprocess_rhs": [False, True],
+}
+
+# parameters of each result, in the order of the CSV columns
+RESULT_FIELDS = ["case", "test", "similarity_choice", "variant", "shedding_n", "preprocess_rhs", "repeat", "time",
+                 "iterations", "expansions", "peak_memory", "path_length", "solved"]
+KEY_FIELDS = ["case", "test", "similarity_choice", "variant", "shedding_n", "preprocess_rhs"]
+
+
+def _notebook_code(file_name):
+    # the code cells of a notebook, without IPython magics and shell commands
+    with open(file_name, encoding="utf-8") as f:
+        notebook = json.load(f)
+    cells = []
+    for cell in notebook["cells"]:
+        if cell["cell_type"] == "code":
+            lines = "".join(cell["source"]).splitlines()
+            cells.append("\n".join(line for line in lines if not line.lstrip().startswith(("%", "!"))))
+    return cells
+
+
+def run_notebook(file_name, namespace=None):
+    """
+    Executes the code cells of a notebook and returns the namespace with all names it defined. The folder of the
+    notebook is the working directory (and on the path) while it runs, so it can import the notebooks next to it.
+    """
+    namespace = {"__name__": "__notebook__"} if namespace is None else namespace
+    folder = os.path.dirname(os.path.abspath(file_name))
+    cwd = os.getcwd()
+    sys.path.insert(0, folder)
+    os.chdir(folder)
+    try:
+        for code in _notebook_code(file_name):
+            exec(compile(code, file_name, "exec"), namespace)
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(folder)
+    return namespace
+
+
+def _require(notebook, modules):
+    # raises an ImportError if a module that the notebook needs is not installed
+    missing = [module for module in modules if importlib.util.find_spec(module) is None]
+    if missing:
+        raise ImportError(notebook + " needs packages that are not installed: " + ", ".join(missing) + ".")
+
+
+def _notebook_a_star(namespace):
+    """
+    The A* of a_star.ipynb (in namespace), with the stats and profiler parameters of the A* of this package. A
+    profiler profiles the whole search. The SearchStats object gets the iterations, expansions and the time of the
+    phases scoring, models and regular, from wrappers around the functions that the notebook calls:
+    get_scores() once per iteration, SetOfSources.get_neighbours_models() once per expansion, and
+    SetOfSources.get_neighbours().
+    """
+    a_star = namespace["a_star"]
+    set_of_sources_class = namespace["SetOfSources"]
+
+    def search(start_set, goal, models, max_iteration, stats=None, profiler=None, **kwargs):
+        if profiler is not None:
+            with profiler:
+                return search(start_set, goal, models, max_iteration, stats=stats, **kwargs)
+        if stats is None:
+            return a_star(start_set, goal, models, max_iteration, **kwargs)
+
+        get_scores = namespace["get_scores"]
+        get_neighbours_models = set_of_sources_class.get_neighbours_models
+        get_neighbours = set_of_sources_class.get_neighbours
+        iteration = [0]
+
+        def scores(similarity_choice, open_list, *args, **kwargs):
+            # the notebook adds one set of sources to its closed list in every iteration
+            stats.sample(iteration[0], open_list, range(iteration[0]))
+            iteration[0] += 1
+            with stats.phase("scoring"):
+                return get_scores(similarity_choice, open_list, *args, **kwargs)
+
+        def neighbours_models(self, *args, **kwargs):
+            stats.count("expansions")
+            with stats.phase("models"):
+                return get_neighbours_models(self, *args, **kwargs)
+
+        def neighbours(self, *args, **kwargs):
+            with stats.phase("regular"):
+                return get_neighbours(self, *args, **kwargs)
+
+        namespace["get_scores"] = scores
+        set_of_sources_class.get_neighbours_models = neighbours_models
+        set_of_sources_class.get_neighbours = neighbours
+        stats.start()
+        try:
+            return a_star(start_set, goal, models, max_iteration, **kwargs)
+        finally:
+            stats.stop()
+            namespace["get_scores"] = get_scores
+            set_of_sources_class.get_neighbours_models = get_neighbours_models
+            set_of_sources_class.get_neighbours = get_neighbours
+
+    return search
+
+
+def _jos_case(notebook, test_names):
+    # a case of the article: the tests are TestCase objects in the notebook, searched with the A* of a_star.ipynb
+    def load():
+        _require(notebook, ["ipynb", "matplotlib"])
+        namespace = run_notebook(os.path.join(NOTEBOOK_ROOT, "jos_article", notebook))
+        run_notebook(os.path.join(NOTEBOOK_ROOT, "jos_article", "a_star.ipynb"), namespace)
+        return [(name, namespace[name].start_set, namespace[name].goal, namespace[name].models or [],
+                 _notebook_a_star(namespace)) for name in test_names]
+    return load
+
+
+def _essnet_case():
+    # the ESSnet case: each of the goals, from all potential data sources with all potential models
+    def load():
+        _require("case_essnet.ipynb", ["ipywidgets", "IPython", "pandas"])
+        namespace = run_notebook(os.path.join(NOTEBOOK_ROOT, "essnet", "case_essnet.ipynb"))
+        md = namespace["md"]
+        return [("goal " + str(k), md.SetOfSources(namespace["start_set_potential"]), goal,
+                 namespace["potential_models_mno"], md.a_star)
+                for k, goal in enumerate(namespace["goal_options"])]
+    return load
+
+
+def _synthetic_case(**parameters):
+    # a generated catalog (see generate_catalog()), for scaling tests
+    def load():
+        case = generate_catalog(**parameters)
+        return [("seed " + str(parameters.get("seed", 0)), case.start_set, case.goal, case.models, a_star_package)]
+    return load
+
+
+# case name -> function that sets up the case and returns a list of
+# (test name, start set, goal, models, a_star function with the stats and profiler parameters)
+CASES = {
+    "case_abstract_small": _jos_case("case_abstract_small.ipynb", ["test_1", "test_2"]),
+    "case_abstract_medium": _jos_case("case_abstract_medium.ipynb", ["test_" + str(k) for k in range(1, 9)]),
+    "case_abstract_large": _jos_case("case_abstract_large.ipynb", ["test_1", "test_2"]),
+    "case_mobility": _jos_case("case_mobility.ipynb", ["test_mobility"]),
+    "case_essnet": _essnet_case(),
+    "synthetic_small": _synthetic_case(n_sources=10, n_variables=8, seed=0),
+    "synthetic_medium": _synthetic_case(n_sources=50, n_variables=20, seed=0),
+    "synthetic_large": _synthetic_case(n_sources=200, n_variables=50, depth=4, branching=3, seed=0),
+}
+
+
+def parameter_grid(grid=DEFAULT_GRID):
+    # all combinations of the values in grid, as a list of dictionaries
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _path_length(result):
+    # length of the path of a solution, or None if the search did not find one
+    if hasattr(result, "path"):
+        return len(result.path)
+    if hasattr(result, "best_set"):
+        return None  # stopped by its budget
+    if isinstance(result, list) and result and hasattr(result[0], "path"):
+        return min(len(r.path) for r in result)
+    return None
+
+
+def _profile_name(case, test, parameters):
+    # start of the file names of a profiled run, for example case_essnet_goal_0_sum_base_False_None
+    return re.sub(r"\W+", "_", "_".join([case, test] + [str(value) for value in parameters.values()]))
+
+
+def run_case(case, parameters, max_iteration=200, repeats=1, track_memory=True, prints=False, profile_dir=None,
+             profile_phases=None):
+    """
+    Runs all tests of case (a name in CASES) with the search parameters (a dictionary with the keys of
+    DEFAULT_GRID, and optionally score_function_parameter) and returns a list of results (dictionaries). If
+    profile_dir is given, each test is run once more with a SearchProfiler that writes its files to profile_dir
+    (only the phases in profile_phases, if given; the A* of the notebooks is always profiled as a whole).
+    """
+    parameters = dict(parameters)
+    shedding_n = parameters.pop("shedding_n", None)
+    kwargs = dict(parameters, shedding=shedding_n is not None, shedding_n=shedding_n or 10)
+    if kwargs.get("similarity_choice") == "topsum":
+        kwargs.setdefault("score_function_parameter", 3)
+
+    n_tests = len(CASES[case]())
+    results = []
+    for test_index in range(n_tests):
+        # timed runs, then (optionally) a run that measures the peak memory and a profiled run
+        runs = ["timed"] * repeats + (["memory"] if track_memory else []) + (["profile"] if profile_dir else [])
+        for repeat, run in enumerate(runs):
+            # set up the case again for every run, the graphs are kept globally and single use models change them
+            name, start_set, goal, models, a_star = CASES[case]()[test_index]
+
+            if run == "profile":
+                # cProfile and tracemalloc slow the search down, so the time of this run is not used either
+                profile_name = _profile_name(case, name, dict(parameters, shedding_n=shedding_n))
+                profiler = SearchProfiler(profile_dir, name=profile_name, phases=profile_phases)
+                a_star(start_set, goal, models, max_iteration, profiler=profiler, **kwargs)
+                if prints:
+                    print("   profile: " + ", ".join(profiler.files))
+                continue
+
+            stats = SearchStats()
+
+            # the memory run measures the peak memory, tracemalloc slows the search down so its time is not used
+            memory_run = run == "memory"
+            if memory_run:
+                tracemalloc.start()
+            t = time.perf_counter()
+            result = a_star(start_set, goal, models, max_iteration, stats=stats, **kwargs)
+            elapsed = time.perf_counter() - t
+            if memory_run:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                for r in results:
+                    if r["test"] == name:
+                        r["peak_memory"] = peak_memory
+                continue
+
+            path_length = _path_length(result)
+            expansions = stats.counters.get("expansions", 0)
+            results.append({
+                "case": case,
+                "test": name,
+                "similarity_choice": parameters.get("similarity_choice", "sum"),
+                "variant": parameters.get("variant", "base"),
+                "shedding_n": shedding_n,
+                "preprocess_rhs": parameters.get("preprocess_rhs", False),
+                "repeat": repeat,
+                "time": elapsed,
+                "iterations": stats.frontier[-1][0] + 1 if stats.frontier else None,
+                "expansions": expansions,
+                "peak_memory": None,
+                "path_length": path_length,
+                "solved": path_length is not None,
+            })
+            if prints:
+                print(case, name, parameters, "time", round(elapsed, 4), "path length", path_length)
+    return results
+
+
+def run_benchmark(cases=None, grid=DEFAULT_GRID, max_iteration=200, repeats=1, track_memory=True, output=None,
+                  prints=False, profile_dir=None, profile_phases=None):
+    """
+    Runs each case in cases (default: all cases in CASES) for each combination of parameters in grid. Returns a
+    list of results, and saves them to output (a .json or .csv file name) if given. See run_case() for profile_dir
+    and profile_phases. Cases whose notebooks need packages that are not installed are skipped (with a message).
+    """
+    results = []
+    for case in (list(CASES) if cases is None else cases):
+        try:
+            for parameters in parameter_grid(grid):
+                results += run_case(case, parameters, max_iteration=max_iteration, repeats=repeats,
+                                    track_memory=track_memory, prints=prints, profile_dir=profile_dir,
+                                    profile_phases=profile_phases)
+        except ImportError as error:
+            # raised when the case is set up, before its first run
+            print("Skipping " + case + ": " + str(error))
+    if output is not None:
+        save_results(results, output)
+    return results
+
+
+def save_results(results, file_name):
+    if file_name.endswith(".csv"):
+        with open(file_name, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(file_name, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+
+
+def _csv_value(value):
+    # values in a CSV file are strings, convert them back
+    if value == "":
+        return None
+    if value in ("True", "False"):
+        return value == "True"
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def load_results(file_name):
+    if file_name.endswith(".csv"):
+        with open(file_name, newline="", encoding="utf-8") as f:
+            return [{k: _csv_value(v) for k, v in row.items()} for row in csv.DictReader(f)]
+    with open(file_name, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _summary(results):
+    # results grouped by case, test and parameters: median time over the repeats, other values of the first run
+    groups = {}
+    for r in results:
+        key = tuple(str(r[field]) for field in KEY_FIELDS)
+        groups.setdefault(key, []).append(r)
+    summary = {}
+    for key, runs in groups.items():
+        summary[key] = dict(runs[0], time=statistics.median(r["time"] for r in runs))
+    return summary
+
+
+def compare_results(baseline, current, time_tolerance=0.2, memory_tolerance=0.2, min_time=0.01):
+    """
+    Compares two lists of results (see run_benchmark()) of the same cases and parameters. Returns a list of
+    regressions: dictionaries with the case, test and parameters, and the reasons. A run is a regression if it no
+    longer finds a solution, finds a longer path, expands more sets of sources, or if its (median) time or peak
+    memory grew by more than the tolerance (a fraction). Times below min_time seconds are not compared.
+    """
+    baseline_summary = _summary(baseline)
+    regressions = []
+    for key, now in _summary(current).items():
+        before = baseline_summary.get(key)
+        if before is None:
+            continue
+        reasons = []
+        if before["solved"] and not now["solved"]:
+            reasons.append("no longer solved")
+        elif before["path_length"] is not None and now["path_length"] is not None and \
+                now["path_length"] > before["path_length"]:
+            reasons.append("path length " + str(before["path_length"]) + " -> " + str(now["path_length"]))
+        if before["expansions"] is not None and now["expansions"] is not None and \
+                now["expansions"] > before["expansions"]:
+            reasons.append("expansions " + str(before["expansions"]) + " -> " + str(now["expansions"]))
+        if max(before["time"], now["time"]) >= min_time and now["time"] > before["time"] * (1 + time_tolerance):
+            reasons.append("time " + str(round(before["time"], 4)) + " -> " + str(round(now["time"], 4)) + " s")
+        if before["peak_memory"] and now["peak_memory"] and \
+                now["peak_memory"] > before["peak_memory"] * (1 + memory_tolerance):
+            reasons.append("peak memory " + str(before["peak_memory"]) + " -> " + str(now["peak_memory"]) + " bytes")
+        if reasons:
+            regressions.append(dict(zip(KEY_FIELDS, key), reasons=reasons))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the A* search on the shipped cases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark")
+    run_parser.add_argument("--cases", nargs="+", choices=list(CASES), default=None)
+    run_parser.add_argument("--grid", default=None, help="JSON file with the parameter grid (see DEFAULT_GRID)")
+    run_parser.add_argument("--max-iteration", type=int, default=200)
+    run_parser.add_argument("--repeats", type=int, default=1)
+    run_parser.add_argument("--no-memory", action="store_true", help="do not measure the peak memory")
+    run_parser.add_argument("--output", required=True, help=".json or .csv file")
+    run_parser.add_argument("--profile", default=None, metavar="FOLDER",
+                            help="also run each test with cProfile and tracemalloc, and write the files to FOLDER")
+    run_parser.add_argument("--profile-phases", nargs="+", default=None, 
+                            help="only profile these phases of the search (see SearchStats), default: all")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--time-tolerance", type=float, default=0.2)
+    compare_parser.add_argument("--memory-tolerance", type=float, default=0.2)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        grid = DEFAULT_GRID
+        if args.grid is not None:
+            with open(args.grid, encoding="utf-8") as f:
+                grid = json.load(f)
+        run_benchmark(cases=args.cases, grid=grid, max_iteration=args.max_iteration, repeats=args.repeats,
+                      track_memory=not args.no_memory, output=args.output, prints=True, profile_dir=args.profile,
+                      profile_phases=args.profile_phases)
+        return 0
+
+    regressions = compare_results(load_results(args.baseline), load_results(args.current),
+                                  time_tolerance=args.time_tolerance, memory_tolerance=args.memory_tolerance)
+    for r in regressions:
+        print(", ".join(str(r[field]) for field in KEY_FIELDS) + ": " + "; ".join(r["reasons"]))
+    print(str(len(regressions)) + " regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
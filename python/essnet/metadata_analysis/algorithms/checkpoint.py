@@ -0,0 +1,139 @@
+"""
+# Checkpoints
+Saves the state of an A* search (open list, closed list, success list, iteration, agg flag and best set so far) to a
+file, so a_star() can resume from it after the Python process was stopped (see the checkpoint_path,
+checkpoint_interval and resume_from parameters of a_star()). A search with lazy_neighbours cannot be saved: the
+NeighbourStreams of the sets of sources that were put back in the open list are generators, so a_star() raises a
+ValueError when both are given.
+
+Sets of sources created by SetOfSources.branch() share their data sources and path with their parent, so they are
+stored as a flat table of records: a child only stores the index of its parent and what it added. This keeps the
+file small and avoids deep recursion when pickling long chains of parents. Fingerprints are not stored, because
+they depend on hash() of strings, which differs between Python processes; the open and closed lists are rebuilt
+on loading.
+"""
+
+import os
+import pickle
+import tempfile
+
+from metadata_analysis.metadata.set_of_sources import SetOfSources, SetOfSourcesChild
+from metadata_analysis.algorithms.search_lists import OpenList, ClosedList, BoundedClosedList
+
+CHECKPOINT_VERSION = 1
+
+
+class _StateRecorder:
+    # gives each set of sources an index in a flat list of records, parents before children
+
+    def __init__(self):
+        self.index = {}  # id(set_of_sources) -> index in records
+        self.records = []
+        self.keep_alive = []  # keeps the objects alive, so their id's cannot be reused while recording
+
+    def record(self, set_of_sources):
+        # walk up the chain of parents until a recorded (or plain) set of sources is found
+        chain = []
+        state = set_of_sources
+        while id(state) not in self.index:
+            chain.append(state)
+            if isinstance(state, SetOfSourcesChild) and not state._modified:
+                state = state.parent
+            else:
+                break
+
+        for state in reversed(chain):
+            if isinstance(state, SetOfSourcesChild) and not state._modified:
+                record = ("child", self.index[id(state.parent)], state.data_new, state.path_step, state.iteration,
+                          state.score)
+            else:
+                record = ("set", state.set_of_sources, state.path, state.tree, state.score)
+            self.index[id(state)] = len(self.records)
+            self.records.append(record)
+            self.keep_alive.append(state)
+
+        return self.index[id(set_of_sources)]
+
+
+def _restore_states(records):
+    states = []
+    for record in records:
+        if record[0] == "child":
+            _, parent_index, data_new, path_step, iteration, score = record
+            state = SetOfSourcesChild(states[parent_index], data_new, path_step, iteration)
+        else:
+            _, set_of_sources, path, tree, score = record
+            state = SetOfSources(set_of_sources)
+            state.path = path
+            state.tree = tree
+        state.score = score
+        states.append(state)
+    return states
+
+
+def save_checkpoint(file_name, open_list, closed_list, success_list, iteration, agg, current_score, best_set=None,
+                    best_score=None):
+    """
+    Writes the search state to file_name. The file is replaced in one step, so an interrupted save never leaves a
+    broken checkpoint behind.
+    """
+    recorder = _StateRecorder()
+
+    # open list entries in the order they were added, so ties are broken in the same way after resuming
+    open_entries = [(-entry[0], recorder.record(entry[2])) for entry in sorted(open_list.heap, key=lambda e: e[1])]
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "open": open_entries,
+        "closed": [recorder.record(s) for s in closed_list],
+        "closed_max_size": getattr(closed_list, "max_size", None),
+        "success": [recorder.record(s) for s in success_list],
+        "best": (recorder.record(best_set) if best_set is not None else None, best_score),
+        "iteration": iteration,
+        "agg": agg,
+        "current_score": current_score,
+    }
+    checkpoint["records"] = recorder.records
+
+    directory = os.path.dirname(os.path.abspath(file_name))
+    fd, tmp_name = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_name, file_name)
+
+
+def load_checkpoint(file_name):
+    """
+    Reads a checkpoint written by save_checkpoint(). Returns a dictionary with the open_list, closed_list,
+    success_list, iteration, agg, current_score, best_set and best_score.
+    """
+    with open(file_name, "rb") as f:
+        checkpoint = pickle.load(f)
+
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError("Unknown checkpoint version in " + str(file_name))
+
+    states = _restore_states(checkpoint["records"])
+
+    open_list = OpenList()
+    for score, idx in checkpoint["open"]:
+        open_list.push(states[idx], score)
+
+    if checkpoint["closed_max_size"] is None:
+        closed_list = ClosedList()
+    else:
+        closed_list = BoundedClosedList(checkpoint["closed_max_size"])
+    for idx in checkpoint["closed"]:
+        closed_list.add(states[idx])
+
+    best_index, best_score = checkpoint["best"]
+
+    return {
+        "open_list": open_list,
+        "closed_list": closed_list,
+        "success_list": [states[idx] for idx in checkpoint["success"]],
+        "iteration": checkpoint["iteration"],
+        "agg": checkpoint["agg"],
+        "current_score": checkpoint["current_score"],
+        "best_set": states[best_index] if best_index is not None else None,
+        "best_score": best_score,
+    }
@@ -0,0 +1,116 @@
+"""
+# Goal distance heuristic
+The similarity score functions count how many variables of the data sources overlap with the goal. They are not an
+estimate of the number of steps that are still needed, so the search with these scores is a best-first search. The
+GoalDistanceHeuristic gives a lower bound on the number of steps that are still needed to reach the goal, which
+makes the search an A* search: a set of sources is scored with -(g + weight * h), where g is the length of its path
+and h is the heuristic. With weight 1 the first solution found has the shortest path (for the neighbours the search
+generates); with weight w > 1 the path is at most w times as long as the shortest path, but fewer sets of sources
+are expanded.
+
+For each right-hand side variable of the goal, the number of steps needed to get it at the granularity of the goal
+is computed once, when the heuristic is created: 0 from the goal granularity itself and 1 from the granularities
+from which the goal granularity can be reached in the AggregationGraph, since an aggregation goes to any reachable
+granularity in a single step.
+
+The goal is found as a single data source. Combining data sources is only possible when their right-hand side
+variables are equal, and does not change them, so the right-hand side variables of the goal come from one of the
+data sources in the set, or from the output of a model. From a data source d, at least the following steps are
+needed:
+    - 1 aggregation for each right-hand side variable of the goal that d has at another granularity (an
+      aggregation changes a single variable), it cannot be done if d does not have the variable
+    - 1 step (conversion or combination) if d does not have all left-hand side variables of the goal
+From the output of a model, the model itself is one more step. The heuristic is the minimum over all data sources
+in the set and all model outputs.
+"""
+
+import math
+
+from metadata_analysis.metadata.aggregation import AggregationGraph
+from metadata_analysis.metadata.errors import NotInitialisedError
+
+# among sets of sources with the same g + weight * h, prefer the one that is closest to the goal (the deepest)
+TIE_BREAK = 1e-6
+
+
+class GoalDistanceHeuristic:
+    """
+    Lower bound on the number of steps from a set of sources to goal, using the aggregation graphs and the output 
+    data of models (only the models that can be used multiple times, single use models change the graphs before 
+    the search starts). The lower bound of each set of sources is kept in SetOfSources.memo.
+    """
+
+    def __init__(self, goal, models=None, weight=1):
+        self.goal = goal
+        self.weight = 1 if weight is None else weight
+
+        # per right-hand side variable of the goal: granularity -> steps to the goal granularity
+        self.steps_right = [(v, self._steps_aggregation(v)) for v in goal.right_variables]
+
+        # steps to the goal via the output of one of the models
+        self.h_models = math.inf
+        for m in models or []:
+            output = getattr(m, "output_data", None)
+            if output is None:
+                # the output of this model is not known in advance, so it may give the goal in a single step
+                self.h_models = min(self.h_models, 1)
+                continue
+            for d in (output if isinstance(output, (list, set)) else [output]):
+                self.h_models = min(self.h_models, 1 + self.source_steps(d))
+
+        self.memo_key = ("goal_distance", goal.fingerprint(), tuple(sorted(id(m) for m in models)))
+
+    def _steps_aggregation(self, v):
+        # right-hand side variable: aggregations go from a granularity to all granularities that can be reached
+        steps = {v.granularity: 0}
+        try:
+            graph = AggregationGraph.get(v.name)
+        except NotInitialisedError:
+            return steps
+        if v.granularity in graph.Graph:
+            steps.update({g: 1 for g in graph.all_aggregations_reversed(v.granularity) if g != v.granularity})
+        return steps
+
+    def source_steps(self, d):
+        # lower bound on the number of steps from data source d to the goal (math.inf if it cannot be reached from d)
+        total = 0
+        for v, steps in self.steps_right:
+            total += min([steps.get(v_d.granularity, math.inf) for v_d in d.right_variables if v_d.name == v.name],
+                         default=math.inf)
+
+        if not self.goal.left_variables.issubset(d.left_variables):
+            # a conversion, or a combination with a data source that has the missing variables
+            total += 1
+        return total
+
+    def h(self, set_of_sources):
+        # lower bound on the number of steps to the goal (math.inf if the goal cannot be reached). As long as a set
+        # of sources created by branch() was not changed, this follows from its parent and the added data source.
+        key = self.memo_key
+        if key not in set_of_sources.memo:
+            parent = getattr(set_of_sources, "parent", None)
+            if parent is not None and not set_of_sources._modified and key in parent.memo:
+                set_of_sources.memo[key] = min(parent.memo[key], self.source_steps(set_of_sources.data_new))
+            else:
+                set_of_sources.memo[key] = min([self.h_models] + 
+                                               [self.source_steps(d) for d in set_of_sources.set_of_sources])
+        return set_of_sources.memo[key]
+
+    def g(self, set_of_sources):
+        # number of steps taken so far, the length of the path (kept in memo, so the path of a set of sources
+        # created by branch() does not need to be put together)
+        if "path_length" not in set_of_sources.memo:
+            parent = getattr(set_of_sources, "parent", None)
+            if (parent is not None and not set_of_sources._modified and set_of_sources._path is None and
+                    "path_length" in parent.memo):
+                path_step = set_of_sources.path_step
+                set_of_sources.memo["path_length"] = (parent.memo["path_length"] + 
+                                                      (len(path_step) if isinstance(path_step, list) else 1))
+            else:
+                set_of_sources.memo["path_length"] = len(set_of_sources.path)
+        return set_of_sources.memo["path_length"]
+
+    def score(self, set_of_sources):
+        # higher is better, like the similarity scores
+        h = self.h(set_of_sources)
+        return -(self.g(set_of_sources) + self.weight * h + TIE_BREAK * h)
@@ -0,0 +1,137 @@
+"""
+# Parallel neighbour expansion
+The neighbours of a set of sources are found by two independent kinds of work: conversions and aggregations of each
+individual data source, and applying each model to each combination of input data sources. The ParallelExpander
+spreads this work over a pool of worker processes.
+
+Each worker gets the aggregation graphs, conversion graphs, aggregation tables and models once, when it is started
+(see _init_worker()). After that, a task only holds the data sources it works on. The results are merged in the same
+order as in SetOfSources.get_neighbours() and SetOfSources.get_neighbours_models(), so a search gives the same
+result with or without parallel expansion. Combinations of pairs of data sources are not computed:
+SetOfSources.get_neighbours() returns them without a path step, so the search never uses them.
+
+Models are pickled to the workers, so they must be picklable. With the "spawn" start method (the default on Windows
+and macOS), model classes must be importable from a module (not only defined in a notebook).
+"""
+
+import concurrent.futures
+import itertools as itertools
+import numpy as np
+
+from metadata_analysis.metadata.aggregation import AggregationGraph, AggregationTable
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.path_step import Step
+
+# models of a worker process, installed by _init_worker()
+_worker_models = []
+
+
+def _init_worker(aggregation_graphs, conversion_graphs, aggregation_tables, models):
+    # install the graphs, tables and models of the main process in a worker process (once per worker)
+    global _worker_models
+    AggregationGraph.instances = aggregation_graphs
+    ConversionGraph.instances = conversion_graphs
+    AggregationTable.instances = aggregation_tables
+    _worker_models = models
+
+
+def _source_neighbours(sources, agg):
+    # conversions and aggregations of each of the data sources
+    return [d.get_neighbours(agg) for d in sources]
+
+
+def _apply_model(model_index, input_combinations):
+    # output of the model for each combination of input data sources (False if the model is not applicable)
+    model_tmp = _worker_models[model_index]
+    return [model_tmp.apply(potential_input=list(dataset_selection)) for dataset_selection in input_combinations]
+
+
+class ParallelExpander:
+    """
+    Finds the neighbours of a set of sources with a pool of worker processes. get_neighbours() and
+    get_neighbours_models() return the same neighbours and path steps as the methods of SetOfSources with the same
+    name (get_neighbours() without the combinations, which have no path step).
+
+    The graphs, tables and models are copied to the workers when the expander is created, so create it after all
+    single use models have been applied. Call shutdown() (or use a with statement) to stop the workers.
+    """
+
+    def __init__(self, n_processes, models=None, chunks_per_process=4):
+        self.n_processes = n_processes
+        self.chunks_per_process = chunks_per_process  # tasks per worker for each kind of work, for load balancing
+        self.models = list(models or [])
+        self.model_index = {id(m): k for k, m in enumerate(self.models)}
+
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_processes, initializer=_init_worker,
+            initargs=(AggregationGraph.instances, ConversionGraph.instances, AggregationTable.instances, self.models))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def _chunks(self, items):
+        # split items into consecutive chunks, one task each
+        n_chunks = min(len(items), self.n_processes * self.chunks_per_process)
+        if n_chunks == 0:
+            return []
+        bounds = np.linspace(0, len(items), n_chunks + 1).astype(int)
+        return [items[bounds[k]:bounds[k + 1]] for k in range(n_chunks)]
+
+    def get_neighbours(self, set_of_sources, agg=True):
+        # same as set_of_sources.get_neighbours(agg), without the combinations (they have no path step)
+        sources = list(set_of_sources.set_of_sources)  # fixed order of the data sources
+
+        # submit all tasks before waiting for any of the results
+        neighbour_futures = [self.executor.submit(_source_neighbours, chunk, agg) for chunk in self._chunks(sources)]
+
+        all_neighbours = []
+        all_path_steps = []
+
+        # Conversion and aggregating
+        for future in neighbour_futures:
+            for neighbours, path_steps in future.result():
+                # Only add the neighbour if it is not yet included in neighbours
+                for i in range(len(neighbours)):
+                    if neighbours[i] not in all_neighbours:
+                        all_neighbours.append(neighbours[i])
+                        all_path_steps.append(path_steps[i])
+
+        return all_neighbours, all_path_steps
+
+    def get_neighbours_models(self, set_of_sources, models=None):
+        # same as set_of_sources.get_neighbours_models(models), for models that were given to the expander
+        if models is None:
+            return None
+
+        model_futures = []
+        for model_tmp in models:
+            if id(model_tmp) not in self.model_index:
+                raise ValueError("Model " + str(model_tmp.name) + " was not given to the ParallelExpander.")
+
+            # all possible combinations of the required number of input data sets
+            n_input = len(model_tmp.input_data)
+            input_combinations = list(itertools.combinations(set_of_sources.set_of_sources, n_input))
+            model_futures.append((model_tmp, [self.executor.submit(_apply_model, self.model_index[id(model_tmp)], chunk)
+                                              for chunk in self._chunks(input_combinations)]))
+
+        all_neighbours = []
+        all_path_steps = []
+
+        for model_tmp, futures in model_futures:
+            for future in futures:
+                for model_output in future.result():
+                    if model_output:
+                        # The model was applicable and returned output
+                        for mo in model_output:
+                            path_step_tmp = Step("model", model_tmp.name, model_tmp.input_data, mo)
+                            if mo not in all_neighbours:
+                                all_neighbours.append(mo)
+                                all_path_steps.append(path_step_tmp)
+
+        return all_neighbours, all_path_steps
@@ -0,0 +1,132 @@
+"""
+# Profiling
+A SearchProfiler profiles searches with cProfile and tracemalloc, and writes a .pstats file and an allocation
+snapshot for each search: pass it to a_star() with the profiler parameter, or use it in a with block around any
+other code (for example the A* of the notebooks). Either the whole search is profiled, or only some of its phases
+(see SearchStats for the names of the phases). The files are named <name>_<run>.pstats and <name>_<run>.snapshot,
+where run counts the searches of the profiler, and can be read with print_profile() and print_allocations(), or with
+the pstats and tracemalloc modules (or tools like snakeviz).
+
+For example, to find out how much time goes to the deep copies, the subset checks of the sets of included units and
+the aggregation tables:
+    profiler = SearchProfiler("profiles", name="essnet", phases=["regular", "models"])
+    a_star(start_set, goal, models, 100, profiler=profiler)
+    print_profile(profiler.files[0], restriction="deepcopy|is_subset|get_aggregation_table")
+
+Only the code in this process is profiled, not the worker processes of a ParallelExpander (n_processes). The
+allocation snapshot is taken at the end of the search, so it shows the memory that is still in use by the open and
+closed lists (tracemalloc always traces the whole search, also when only some phases are profiled).
+"""
+
+import contextlib
+import cProfile
+import os
+import pstats
+import tracemalloc
+
+
+class SearchProfiler:
+    """
+    Profiler of one or more searches. output_dir: folder for the files (created if needed), name: start of the file
+    names. phases: names of the phases to profile with cProfile, None for the whole search. profile_time: profile
+    with cProfile. track_memory: take an allocation snapshot with tracemalloc, keeping n_frames frames per allocation.
+    """
+
+    def __init__(self, output_dir, name="search", phases=None, profile_time=True, track_memory=True, n_frames=10):
+        self.output_dir = output_dir
+        self.name = name
+        self.phases = None if phases is None else set(phases)
+        self.profile_time = profile_time
+        self.track_memory = track_memory
+        self.n_frames = n_frames
+
+        self.runs = 0  # number of finished searches
+        self.files = []  # names of the written files
+        self.profile = None
+        self.depth = 0  # number of profiled phases that are running (phases can be nested)
+        self.started_tracemalloc = False
+
+    def start(self):
+        # called by a_star() when the search starts
+        self.profile = cProfile.Profile() if self.profile_time else None
+        self.depth = 0
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.n_frames)
+            self.started_tracemalloc = True
+        if self.profile is not None and self.phases is None:
+            self.profile.enable()
+
+    def stop(self):
+        # called by a_star() when the search ends, writes the files of this search
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, self.name + "_" + str(self.runs))
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(prefix + ".pstats")
+            self.files.append(prefix + ".pstats")
+            self.profile = None
+        if self.track_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            # leave out the memory of tracemalloc and the import system
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                               tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")])
+            snapshot.dump(prefix + ".snapshot")
+            self.files.append(prefix + ".snapshot")
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+                self.started_tracemalloc = False
+        self.runs += 1
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # profile the with block, if name is one of the phases to profile
+        if self.profile is None or self.phases is None or name not in self.phases:
+            yield
+            return
+        self.depth += 1
+        if self.depth == 1:
+            self.profile.enable()
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                self.profile.disable()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+
+def print_profile(file_name, n=20, sort="cumulative", restriction=None):
+    """
+    Prints the n functions of a .pstats file with the highest sort (see pstats.SortKey), optionally only the
+    functions that match restriction (a regular expression).
+    """
+    stats = pstats.Stats(file_name)
+    stats.strip_dirs().sort_stats(sort)
+    if restriction is None:
+        stats.print_stats(n)
+    else:
+        stats.print_stats(restriction, n)
+    return stats
+
+
+def print_allocations(file_name, n=10, key_type="lineno"):
+    """Prints the n lines (key_type "lineno"), files ("filename") or tracebacks ("traceback") of an allocation
+    snapshot that hold the most memory"""
+    snapshot = tracemalloc.Snapshot.load(file_name)
+    top = snapshot.statistics(key_type)
+    print("Total: " + str(round(sum(s.size for s in top) / 2**20, 2)) + " MiB")
+    for s in top[:n]:
+        if key_type == "traceback":
+            print(str(round(s.size / 2**10, 1)) + " KiB in " + str(s.count) + " blocks")
+            for line in s.traceback.format():
+                print("   " + line)
+        else:
+            print(s)
+    return top
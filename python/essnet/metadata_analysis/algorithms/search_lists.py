@@ -0,0 +1,351 @@
+"""
+# Open and closed lists for the A* implementation
+The open list holds all sets of sources that are waiting to be evaluated. It is a priority queue: every set of
+sources is scored once, when it is added, and the set with the highest similarity score can be taken off in
+O(log n) time. The closed list holds all sets of sources that have been evaluated.
+
+For long searches, both lists can be bounded: OpenList.shed() keeps only the best sets of sources (beam search),
+and BoundedClosedList only remembers the most recently seen sets of sources (a transposition table). A set of
+sources that was forgotten by the closed list may be evaluated again later, but memory use stays fixed.
+
+Both lists keep their sets of sources in a table keyed by SetOfSources.fingerprint(), so checking if a set of
+sources is already present takes O(1) time. The (more expensive) SetOfSources.__eq__() is only evaluated for sets
+with the same fingerprint.
+"""
+
+import heapq
+import itertools
+from collections import OrderedDict
+
+
+class StateTable:
+    """
+    Table of SetOfSources objects, keyed by their fingerprint. Each key holds a list of sets of sources, because
+    different sets of sources may (rarely) share the same fingerprint.
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return (set_of_sources for bucket in self.table.values() for set_of_sources in bucket)
+
+    def __contains__(self, set_of_sources):
+        bucket = self.table.get(set_of_sources.fingerprint())
+        if bucket is None:
+            return False
+        # only on a fingerprint collision, rely on SetOfSources.__eq__()
+        return any(set_of_sources == other for other in bucket)
+
+    def add(self, set_of_sources):
+        self.table.setdefault(set_of_sources.fingerprint(), []).append(set_of_sources)
+        self.n += 1
+
+    def remove(self, set_of_sources):
+        # remove this specific object (by identity, not by equality)
+        fingerprint = set_of_sources.fingerprint()
+        bucket = self.table[fingerprint]
+        for idx, other in enumerate(bucket):
+            if other is set_of_sources:
+                del bucket[idx]
+                break
+        if not bucket:
+            del self.table[fingerprint]
+        self.n -= 1
+
+
+class OpenList:
+    """
+    Priority queue of SetOfSources objects, ordered by similarity score (highest score first).
+
+    Each entry in the heap is a list [-score, counter, set_of_sources]. The score is negated because heapq
+    keeps the smallest element on top. The counter is increasing, so when two sets have the same score, the
+    set that was added first is taken off first (the same choice as taking the first maximum of a list of scores).
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()  # tie breaker, also keeps sets of sources from being compared directly
+        self.index = StateTable()  # for fast membership checks
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        # iterate over the waiting sets of sources (in no particular order)
+        return (entry[2] for entry in self.heap)
+
+    def __contains__(self, set_of_sources):
+        return set_of_sources in self.index
+
+    def push(self, set_of_sources, score):
+        # add a set of sources with its (already calculated) similarity score
+        heapq.heappush(self.heap, [-score, next(self.counter), set_of_sources])
+        self.index.add(set_of_sources)
+
+    def pop(self):
+        # take the set of sources with the highest score off of the open list, returns a (set_of_sources, score) tuple
+        neg_score, _, set_of_sources = heapq.heappop(self.heap)
+        self.index.remove(set_of_sources)
+        return set_of_sources, -neg_score
+
+    def shed(self, n):
+        # keep only the n best options in the open list (the beam). This speeds up the search and bounds the memory
+        # use, but may lose potential solutions. Returns the sets of sources that were removed.
+        if len(self.heap) <= n:
+            return []
+
+        self.heap.sort()  # a sorted list is a valid heap (equal scores stay in order of the counter)
+        removed = [entry[2] for entry in self.heap[n:]]
+        del self.heap[n:]
+        for set_of_sources in removed:
+            self.index.remove(set_of_sources)
+        return removed
+
+
+class NeighbourList(StateTable):
+    """
+    The new neighbours of the set of sources that is being expanded, in the order in which they were found.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.order = []
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def add(self, set_of_sources):
+        super().add(set_of_sources)
+        self.order.append(set_of_sources)
+
+
+class ClosedList(StateTable):
+    """
+    All sets of sources that have been evaluated.
+    """
+    pass
+
+
+class BoundedClosedList(ClosedList):
+    """
+    Closed list that holds at most max_size sets of sources. When it is full, the set of sources that was least
+    recently added or looked up is forgotten.
+    """
+
+    def __init__(self, max_size):
+        super().__init__()
+        self.max_size = max_size
+        self.table = OrderedDict()  # buckets in order of last use
+        self.n_evicted = 0
+
+    def __contains__(self, set_of_sources):
+        found = super().__contains__(set_of_sources)
+        if found:
+            self.table.move_to_end(set_of_sources.fingerprint())
+        return found
+
+    def add(self, set_of_sources):
+        super().add(set_of_sources)
+        self.table.move_to_end(set_of_sources.fingerprint())
+
+        while self.n > self.max_size:
+            # forget the oldest set of sources (the first in the least recently used bucket)
+            fingerprint, bucket = next(iter(self.table.items()))
+            del bucket[0]
+            if not bucket:
+                del self.table[fingerprint]
+            self.n -= 1
+            self.n_evicted += 1
+
+
+class NeighbourCache:
+    """
+    Neighbours of sets of sources that were expanded before, so they are not found again. The neighbours do not
+    depend on the goal, so the cache can be shared by searches for different goals (see a_star_batch()). Entries
+    are keyed by the fingerprint of the set of sources and the kind of expansion (modelling or not, with or without
+    aggregation), and hold the set of sources as it was when it was expanded.
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.table.values())
+
+    def get(self, set_of_sources, kind):
+        # returns the cached (all_neighbours, all_path_steps), or None if set_of_sources was not expanded before
+        for sources, neighbours in self.table.get((set_of_sources.fingerprint(), kind), []):
+            if sources == set_of_sources.set_of_sources:
+                self.hits += 1
+                return neighbours
+        self.misses += 1
+        return None
+
+    def add(self, set_of_sources, kind, neighbours):
+        # the set of sources is never changed in place (a new set is made when a data source is added)
+        self.table.setdefault((set_of_sources.fingerprint(), kind), []).append((set_of_sources.set_of_sources, 
+                                                                                neighbours))
+
+    def data(self):
+        # all data sources in the cached neighbours (model outputs may be lists of data sources)
+        for bucket in self.table.values():
+            for _, (all_neighbours, _) in bucket:
+                for neighbour in all_neighbours:
+                    if isinstance(neighbour, list):
+                        yield from neighbour
+                    else:
+                        yield neighbour
+
+
+class NeighbourStream:
+    """
+    The neighbours of an expanded set of sources, taken a few at a time and the most promising first (see 
+    SetOfSources.get_neighbours_models_lazy() and SetOfSources.get_neighbours_lazy()). As in the A* search without
+    streams, the regular neighbours (conversion and aggregation) are only created if the models did not give a new
+    neighbour. These always include aggregations, because the search without streams also takes the neighbours 
+    with aggregation whenever agg is False. The neighbours are created with the iteration in which the set of 
+    sources was first expanded.
+    """
+
+    def __init__(self, set_of_sources, goal, models, iteration):
+        self.set_of_sources = set_of_sources
+        self.goal = goal
+        self.iteration = iteration
+        self.models = set_of_sources.get_neighbours_models_lazy(goal, models) if models else iter([])
+        self.regular = None  # started when the models are done
+        self.n_model = 0  # new neighbours found by the models
+        self.finished = False
+
+    def take(self, n, add_neighbour, phase=None):
+        # adds up to n new neighbours with add_neighbour(new set of sources), which returns True if the set of 
+        # sources was new. Returns the number of new neighbours (model, non-model). phase: optional function that
+        # returns a context manager to time the creation of the new sets of sources (see SearchStats.phase())
+        n_model = 0
+        n_nonmodel = 0
+        while not self.finished and n_model + n_nonmodel < n:
+            if self.regular is None:
+                item = next(self.models, None)
+                if item is not None:
+                    if add_neighbour(self._branch(item, phase)):
+                        n_model += 1
+                        self.n_model += 1
+                    continue
+                if self.n_model > 0:
+                    self.finished = True
+                    break
+                self.regular = self.set_of_sources.get_neighbours_lazy(self.goal, agg=True)
+
+            item = next(self.regular, None)
+            if item is None:
+                self.finished = True
+            elif add_neighbour(self._branch(item, phase)):
+                n_nonmodel += 1
+        return n_model, n_nonmodel
+
+    def _branch(self, item, phase):
+        # the new set of sources of a (neighbour, path step)
+        if phase is None:
+            return self.set_of_sources.branch(item[0], item[1], self.iteration)
+        with phase("branching"):
+            return self.set_of_sources.branch(item[0], item[1], self.iteration)
+
+
+class DominanceIndex:
+    """
+    Index of the sets of sources in the open and closed lists, to find sets of sources that dominate a new set of 
+    sources. Set of sources A dominates B if A contains every data source of B, or a data source that can be 
+    shrinked into it (see Data.shrink()). Everything that can be reached from B can then be reached from A.
+
+    For a set of sources created by SetOfSources.branch(), a dominating set must contain all data sources of the
+    parent, so the index maps the fingerprint of each data source to the sets of sources that contain it. The 
+    candidates are found by intersecting these, starting with the smallest, and only the candidates get the 
+    (expensive) shrink check for the added data source.
+    """
+
+    def __init__(self):
+        self.postings = {}  # Data fingerprint -> {id(set_of_sources): (set_of_sources, data source)}
+        self.n_dominated = 0
+
+    def add(self, set_of_sources):
+        for d in set_of_sources.set_of_sources:
+            self.postings.setdefault(d.fingerprint(), {})[id(set_of_sources)] = (set_of_sources, d)
+
+    def remove(self, set_of_sources):
+        for d in set_of_sources.set_of_sources:
+            posting = self.postings.get(d.fingerprint())
+            if posting is not None:
+                posting.pop(id(set_of_sources), None)
+                if not posting:
+                    del self.postings[d.fingerprint()]
+
+    def is_dominated(self, set_of_sources):
+        # only the data source that was added by branch() may be covered by shrinking, all other data sources must 
+        # be in the dominating set of sources
+        data_new = None
+        if getattr(set_of_sources, "_modified", True) is False:
+            data_new = set_of_sources.data_new
+            parent = set_of_sources.parent
+            parent_covers = None  # computed when needed
+        fixed = [d for d in set_of_sources.set_of_sources if d is not data_new]
+        if not fixed:
+            return False
+
+        postings = []
+        for d in fixed:
+            posting = self.postings.get(d.fingerprint())
+            if not posting:
+                return False
+            postings.append((posting, d))
+        postings.sort(key=lambda posting_d: len(posting_d[0]))
+
+        for key, (candidate, _) in postings[0][0].items():
+            if candidate is set_of_sources or not all(key in posting for posting, _ in postings[1:]):
+                continue
+
+            if data_new is not None:
+                links = self._added_since(candidate, parent)
+                if links is not None:
+                    # candidate is (a descendant of) the parent, so it contains all other data sources and only the 
+                    # data sources that were added since the parent need to be checked
+                    if parent_covers is None:
+                        parent_covers = self._covers(parent.set_of_sources, data_new)
+                    if parent_covers or self._covers(links, data_new):
+                        self.n_dominated += 1
+                        return True
+                    continue
+
+            # the candidate contains data sources with the same fingerprints, check that they are equal (they are 
+            # usually the same objects)
+            if not all(posting[key][1] is d or posting[key][1] == d for posting, d in postings):
+                continue
+            if data_new is None or self._covers(candidate.set_of_sources, data_new):
+                if candidate.set_of_sources != set_of_sources.set_of_sources:
+                    self.n_dominated += 1
+                    return True
+        return False
+
+    def _added_since(self, set_of_sources, ancestor):
+        # the data sources added on the way from ancestor to set_of_sources, or None if it does not descend from it
+        added = []
+        while set_of_sources is not ancestor:
+            if getattr(set_of_sources, "_modified", True) is not False:
+                return None
+            added.append(set_of_sources.data_new)
+            set_of_sources = set_of_sources.parent
+        return added
+
+    def _covers(self, data_sources, data_new):
+        # True if one of data_sources can be shrinked into data_new (this includes being equal to data_new)
+        for d in data_sources:
+            # Data.shrink() always compares the sets of included units, so check the variables first
+            if (data_new.left_variables.issubset(d.left_variables) and 
+                    data_new.right_variables.issubset(d.right_variables) and d.shrink(data_new)):
+                return True
+        return False
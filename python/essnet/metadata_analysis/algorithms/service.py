@@ -0,0 +1,348 @@
+"""
+# Search service
+A local HTTP service that answers goal queries with a_star(), so other tools do not have to import the framework,
+build the catalog and apply the single use models before every search. The catalog is loaded once into each worker
+process of a pool when the service starts. It is given as a loader: "module:function", where function takes no
+arguments and returns a TestCase with the start set and the models (its goal is not used), for example
+"metadata_analysis.metadata.synthetic_catalog:generate_catalog".
+
+Each worker runs one search at a time, so the number of workers is the number of searches that run at the same
+time. Up to max_queue more requests wait for a free worker, further requests get status 503. The timeout of a
+request includes the time it waits in the queue: the search gets the time that is left as its SearchBudget, and
+returns the solutions that were found so far when it runs out. A request that gets status 504 because its search
+did not stop in time keeps its place until the search has stopped, so the service never runs more searches than it
+has workers.
+
+Only modules of the standard library are used, and by default the service only listens on localhost. It does not
+check who sends the requests, so do not make it reachable from other machines.
+
+Requests and responses are JSON:
+    GET /health
+    POST /search {"goal": {"left_variables": [["o", 1]], "right_variables": [["t", 2]], "set_of_units": "persons"},
+                  "max_iteration": 200, "timeout": 30, "parameters": {"similarity_choice": "topsum"}}
+Variables are [name, granularity] pairs, and set_of_units is the name of a set of included units of the catalog
+(of a data source or a model). parameters are keyword arguments of a_star(), only those in SERVICE_PARAMETERS. The
+response has a status ("solved", "not_found" or "timeout") and the solutions, each with its path (see query()).
+
+From the command line (in python/essnet/):
+    python -m metadata_analysis.algorithms.service --catalog my_catalog:load --workers 4 --port 8765
+"""
+
+import argparse
+import concurrent.futures
+import http.server
+import importlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.model import ModelSingleUse
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.similarity_memo import SimilarityMemo
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.algorithms.a_star import a_star, SIMILARITY_CHOICES
+from metadata_analysis.algorithms.anytime import SearchBudget, PartialResult
+
+# keyword arguments of a_star() that can be given in a request (others could write files, or use other processes)
+SERVICE_PARAMETERS = ["similarity_choice", "variant", "score_function_parameter", "preprocess_rhs", "shedding",
+                      "shedding_n", "find_multiple_paths", "beam_width", "closed_list_size", "incremental_scoring",
+                      "dominance_pruning", "similarity_memo"]
+
+# seconds a search may run after its timeout (it stops itself at its deadline) before the request gets status 504
+TIMEOUT_GRACE = 10
+
+# catalog of a worker process, loaded by _init_worker()
+_catalog = {}
+
+
+def _load(loader):
+    # call the function of a "module:function" loader
+    module_name, _, function_name = loader.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)()
+
+
+def _sets_of_units(start_set, models):
+    # all sets of included units of the catalog, by name
+    data_sets = list(start_set.set_of_sources)
+    for m in models:
+        data_sets += list(m.input_data)
+        data_sets += m.output_data if isinstance(m.output_data, list) else [m.output_data]
+    return {d.set_of_units.name: d.set_of_units for d in data_sets}
+
+
+def _init_worker(loader):
+    # load the catalog once per worker, and apply the single use models
+    case = _load(loader)
+    models = []
+    for m in case.models or []:
+        if isinstance(m, ModelSingleUse):
+            m.apply()
+        else:
+            models.append(m)
+    start_set = case.start_set if isinstance(case.start_set, SetOfSources) else SetOfSources(case.start_set)
+    _catalog["start_set"] = start_set
+    _catalog["models"] = models
+    _catalog["sets_of_units"] = _sets_of_units(start_set, models)
+    _catalog["prep_rhs_cache"] = {}  # prep_rhs() per right-hand side of the goals, see a_star_batch()
+    _catalog["similarity_memo"] = SimilarityMemo()  # scores of the data sources per goal, for all searches
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def goal_to_json(goal):
+    # the JSON form of a goal (a Data object), for query()
+    return {"left_variables": sorted([v.name, v.granularity] for v in goal.left_variables),
+            "right_variables": sorted([v.name, v.granularity] for v in goal.right_variables),
+            "set_of_units": goal.set_of_units.name,
+            "name": goal.name}
+
+
+def _goal_from_json(goal, sets_of_units):
+    if goal["set_of_units"] not in sets_of_units:
+        raise ValueError("Unknown set of included units: " + str(goal["set_of_units"]))
+    return Data(left_variables=[Variable(name, granularity) for name, granularity in goal["left_variables"]],
+                right_variables=[Variable(name, granularity) for name, granularity in goal["right_variables"]],
+                set_of_units=sets_of_units[goal["set_of_units"]], name=goal.get("name", "goal"))
+
+
+def _solution_to_json(solution):
+    return {"path": [{"method": step.method, "method_detail": str(step.method_detail),
+                      "output": [str(d) for d in step.output]} for step in solution.path],
+            "set_of_sources": sorted(str(d) for d in solution.set_of_sources)}
+
+
+def _result_to_json(result):
+    # the result of a_star(): a solution, a list of solutions (find_multiple_paths), a PartialResult or a message
+    if isinstance(result, PartialResult):
+        return {"status": "timeout", "message": result.reason, "iterations": result.iterations,
+                "solutions": [_solution_to_json(s) for s in result.solutions]}
+    if isinstance(result, SetOfSources):
+        result = [result]
+    if isinstance(result, list) and result:
+        return {"status": "solved", "solutions": [_solution_to_json(s) for s in result]}
+    if result is False or (isinstance(result, list) and not result):
+        # False, or no solutions with find_multiple_paths
+        message = "No path was found."
+    else:
+        message = next(iter(result)) if isinstance(result, set) else str(result)
+    return {"status": "not_found", "message": message, "solutions": []}
+
+
+def _search(goal, max_iteration, deadline, parameters):
+    # runs in a worker process
+    start_set = _catalog["start_set"]
+    goal = _goal_from_json(goal, _catalog["sets_of_units"])
+    t = time.time()
+    if deadline <= t:
+        return {"status": "timeout", "message": "timeout while waiting for a worker", "iterations": 0,
+                "solutions": []}
+
+    # the scores that are kept in the data sources are only valid for a single goal
+    start_set.reset_score()
+    for start_set_prepared in _catalog["prep_rhs_cache"].values():
+        start_set_prepared.reset_score()
+
+    # "similarity_memo": true uses the memo of the worker, which is shared by all searches of the worker
+    parameters = dict(parameters)
+    if parameters.pop("similarity_memo", False):
+        parameters["similarity_memo"] = _catalog["similarity_memo"]
+
+    # each search starts from its own copy of the start set, because the search may add the goal to it
+    result = a_star(start_set.shallow_copy(), goal, _catalog["models"], max_iteration,
+                    budget=SearchBudget(time_budget=round(deadline - t, 3)), prep_rhs_cache=_catalog["prep_rhs_cache"],
+                    **parameters)
+    response = _result_to_json(result)
+    response["time"] = time.time() - t
+    return response
+
+
+class SearchService:
+    """
+    The worker processes and limits of the service. loader: "module:function" that returns the catalog (see above).
+    n_workers: number of worker processes, max_queue: number of requests that can wait for a worker, timeout:
+    default and largest timeout of a request in seconds, max_iteration: default and largest number of iterations.
+    The workers are started (and load the catalog) when the service is created. Call shutdown() to stop them.
+    """
+
+    def __init__(self, loader, n_workers=2, max_queue=8, timeout=30, max_iteration=1000):
+        self.loader = loader
+        self.n_workers = n_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_iteration = max_iteration
+
+        self.slots = threading.BoundedSemaphore(n_workers + max_queue)  # running and waiting requests
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "active": 0, "rejected": 0, "errors": 0}
+
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                                               initargs=(loader,))
+        # start all workers now, so the first requests do not wait for the catalog (raises if the loader fails)
+        self.worker_pids = sorted(set(f.result() for f in [self.executor.submit(_worker_ready)
+                                                           for _ in range(n_workers)]))
+
+    def _count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def _parse(self, request):
+        # check a request before it is sent to a worker, raises ValueError
+        if not isinstance(request, dict) or not isinstance(request.get("goal"), dict):
+            raise ValueError("The request must be a JSON object with a goal.")
+        for key in ["left_variables", "right_variables", "set_of_units"]:
+            if key not in request["goal"]:
+                raise ValueError("The goal has no " + key + ".")
+        parameters = request.get("parameters", {})
+        unknown = sorted(set(parameters) - set(SERVICE_PARAMETERS))
+        if unknown:
+            raise ValueError("Unknown parameters: " + ", ".join(unknown))
+        if parameters.get("similarity_choice", "sum") not in SIMILARITY_CHOICES:
+            raise ValueError("Unknown similarity_choice: " + str(parameters["similarity_choice"]))
+        timeout = min(float(request.get("timeout", self.timeout)), self.timeout)
+        max_iteration = min(int(request.get("max_iteration", self.max_iteration)), self.max_iteration)
+        return request["goal"], max_iteration, timeout, parameters
+
+    def _release(self, future=None):
+        # frees the slot of a request (as a done callback: when its search has stopped, also after a timeout)
+        self._count("active", -1)
+        self.slots.release()
+
+    def search(self, request):
+        # answers a search request, returns (HTTP status, response)
+        self._count("requests")
+        if not self.slots.acquire(blocking=False):
+            self._count("rejected")
+            return 503, {"status": "busy", "message": "Too many requests, try again later."}
+        self._count("active")
+        try:
+            goal, max_iteration, timeout, parameters = self._parse(request)
+            future = self.executor.submit(_search, goal, max_iteration, time.time() + timeout, parameters)
+        except (ValueError, TypeError) as error:
+            self._release()
+            return 400, {"status": "error", "message": str(error)}
+        except BaseException:
+            self._release()
+            raise
+        # the slot stays taken until the search has stopped: a running search can not be cancelled, and its worker is
+        # not free before it returns
+        future.add_done_callback(self._release)
+
+        try:
+            # the search stops itself when its budget runs out, so only a single very long expansion (or a lost
+            # worker) gets here
+            return 200, future.result(timeout=timeout + TIMEOUT_GRACE)
+        except concurrent.futures.TimeoutError:
+            future.cancel()  # only has an effect while the request waits for a worker
+            return 504, {"status": "timeout", "message": "The search did not stop in time.", "solutions": []}
+        except (ValueError, KeyError, TypeError) as error:
+            return 400, {"status": "error", "message": str(error)}
+        except Exception as error:
+            self._count("errors")
+            return 500, {"status": "error", "message": type(error).__name__ + ": " + str(error)}
+
+    def health(self):
+        with self.lock:
+            counters = dict(self.counters)
+        return dict(counters, status="ok", loader=self.loader, workers=self.n_workers, max_queue=self.max_queue,
+                    worker_pids=self.worker_pids)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # the service is in self.server.service (see serve())
+
+    def _reply(self, status, response):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, self.server.service.health())
+        else:
+            self._reply(404, {"status": "error", "message": "Unknown path: " + self.path})
+
+    def do_POST(self):
+        if self.path != "/search":
+            self._reply(404, {"status": "error", "message": "Unknown path: " + self.path})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError as error:
+            self._reply(400, {"status": "error", "message": "Invalid JSON: " + str(error)})
+            return
+        self._reply(*self.server.service.search(request))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(loader, host="127.0.0.1", port=8765, n_workers=2, max_queue=8, timeout=30, max_iteration=1000,
+          verbose=False):
+    """Starts a SearchService and answers requests until the process is stopped"""
+    service = SearchService(loader, n_workers=n_workers, max_queue=max_queue, timeout=timeout,
+                            max_iteration=max_iteration)
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    server.service = service
+    server.verbose = verbose
+    print("Search service for " + loader + " on http://" + host + ":" + str(server.server_port) + " (" +
+          str(n_workers) + " workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def query(goal, url="http://127.0.0.1:8765", max_iteration=None, timeout=None, **parameters):
+    """
+    Sends a search request to a running service and returns the response: a dictionary with the status ("solved",
+    "not_found", "timeout", "busy" or "error"), a message and the solutions (each a dictionary with the path and the
+    set of sources). goal is a Data object or its JSON form (see goal_to_json()), parameters are passed to a_star().
+    """
+    request = {"goal": goal if isinstance(goal, dict) else goal_to_json(goal), "parameters": parameters}
+    if max_iteration is not None:
+        request["max_iteration"] = max_iteration
+    if timeout is not None:
+        request["timeout"] = timeout
+    http_request = urllib.request.Request(url.rstrip("/") + "/search", data=json.dumps(request).encode("utf-8"),
+                                          headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(http_request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        # the service also answers errors with JSON
+        return json.loads(error.read())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON service for path searches in a catalog.")
+    parser.add_argument("--catalog", required=True, help="module:function that returns a TestCase")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=30, help="seconds, including the time in the queue")
+    parser.add_argument("--max-iteration", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    serve(args.catalog, host=args.host, port=args.port, n_workers=args.workers, max_queue=args.max_queue,
+          timeout=args.timeout, max_iteration=args.max_iteration, verbose=args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+# Solution cache
+Stores the results of a_star() on disk, so running the same case again (for example when a notebook is rerun)
+takes milliseconds instead of a full search. A result is stored under a key that is computed from everything that
+the search depends on: the start set (and its path) and the goal (including the unit type and specifying variables
+of their sets of included units), the models (all their attributes, and their code), the contents of all
+AggregationGraph, ConversionGraph and AggregationTable instances, and the search parameters. Any change to these
+gives a different key, so an outdated result is never returned. Values are described by their contents, so the key
+is the same in every Python process; a value that can only be described by its memory address raises a ValueError.
+
+The cache directory is limited to max_bytes. When it is full, the results that were used least recently are
+removed.
+"""
+
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from metadata_analysis.metadata.aggregation import AggregationGraph, AggregationTable
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.interned_variable import InternedVariable, InternedVariableSpec
+from metadata_analysis.metadata.model import ModelSingleUse
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.similarity_engine import SimilarityEngine
+from metadata_analysis.metadata.similarity_memo import SimilarityMemo
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.algorithms.a_star import a_star
+
+# parameters of a_star() that do not change its result (they only change how fast it is found, or what is printed)
+IGNORED_PARAMETERS = ["start_set", "goal", "models", "prints", "n_processes", "neighbour_cache", "prep_rhs_cache",
+                      "stats", "profiler", "yield_every"]
+
+
+def _code_description(code):
+    # byte code, names and constants of a code object (nested code objects are described in the same way, because
+    # their repr() contains a memory address)
+    consts = [_code_description(c) if inspect.iscode(c) else repr(c) for c in code.co_consts]
+    return repr(code.co_code) + repr(code.co_names) + "(" + ", ".join(consts) + ")"
+
+
+def _code_fingerprint(cls):
+    # the code of all methods of a class (and its base classes), so a changed model gives a different key
+    parts = []
+    for klass in cls.__mro__:
+        if klass is object:
+            continue
+        parts.append(klass.__module__ + "." + klass.__qualname__)
+        for name, value in sorted(vars(klass).items()):
+            if hasattr(value, "__code__"):
+                parts.append(name + _code_description(value.__code__))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _graph_description(graph):
+    # nodes and edges (with their attributes) of an AggregationGraph or ConversionGraph
+    nodes = sorted(str(n) for n in graph.Graph.nodes)
+    edges = sorted(str(e[0]) + "->" + str(e[1]) + str(sorted((str(k), str(v)) for k, v in e[2].items()))
+                   for e in graph.Graph.edges(data=True))
+    return str(graph.variable_name) + str(nodes) + str(edges)
+
+
+def _table_description(table):
+    value_map = sorted((str(k), sorted(str(x) for x in v)) for k, v in table.value_map.items())
+    return (str(table.variable_name) + str(table.granularity_from) + str(table.granularity_to) + str(value_map) +
+            str([str(x) for x in table.shortcut_path]))
+
+
+def _data_description(d):
+    # str(d) only has the name of the set of included units, str() of the set of included units (also of a union) has
+    # its unit type and all specifying variables with their values
+    return str(d) + " " + str(d.set_of_units)
+
+
+def _value_description(value, parents=()):
+    # description of a value (an attribute of a model, a path step or a parameter) by its contents, with the full
+    # contents of data sources and sets of included units. It must not depend on the process, so a value that can
+    # only be described by its memory address raises a ValueError. parents: id()'s of the values it is part of.
+    if id(value) in parents:
+        raise ValueError("A value that contains itself cannot be described for the solution cache.")
+    parents = parents + (id(value),)
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+        return repr(value)
+    if isinstance(value, Data):
+        return _data_description(value)
+    if isinstance(value, (SetOfIncludedUnits, Variable, InternedVariable, InternedVariableSpec)):
+        return str(value)
+    if isinstance(value, dict):
+        return "{" + ", ".join(sorted(_value_description(k, parents) + ": " + _value_description(v, parents)
+                                      for k, v in value.items())) + "}"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(_value_description(v, parents) for v in value)) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_value_description(v, parents) for v in value) + "]"
+    if isinstance(value, np.ndarray):
+        return "array" + _value_description(value.tolist(), parents)
+    if inspect.isfunction(value) or inspect.ismethod(value):
+        return value.__qualname__ + _code_description(value.__code__)
+    if hasattr(value, "__dict__"):
+        # all attributes (except caches, the attributes that start with "_")
+        attributes = sorted((name, v) for name, v in vars(value).items() if not name.startswith("_"))
+        return (type(value).__qualname__ + "(" +
+                ", ".join(name + "=" + _value_description(v, parents) for name, v in attributes) + ")")
+    description = repr(value)
+    if " at 0x" in description:
+        raise ValueError("Cannot describe " + type(value).__qualname__ + " for the solution cache.")
+    return description
+
+
+def _model_description(m):
+    # all attributes of the model (except caches, the attributes that start with "_") and the code of its class
+    return _value_description(m) + "\n" + _code_fingerprint(type(m))
+
+
+def _parameter_description(value):
+    if isinstance(value, SimilarityEngine):
+        return "SimilarityEngine" + str(
+            [value.weight_right_sim, value.weight_right_eq, value.weight_left_sim, value.weight_left_eq,
+             value.weight_units])
+    if isinstance(value, SimilarityMemo):
+        # the scores in the memo do not change the result, only whether a memo is used
+        return "SimilarityMemo"
+    return _value_description(value)
+
+
+def _flatten(result):
+    # a SetOfSources created by branch() refers to all of its ancestors, only store what is needed for the result
+    if isinstance(result, SetOfSources):
+        flat = SetOfSources(result.set_of_sources)
+        flat.path = list(result.path)
+        flat.tree = list(result.tree)
+        flat.score = result.score
+        return flat
+    elif isinstance(result, list):
+        return [_flatten(r) for r in result]
+    return result
+
+
+class SolutionCache:
+    """
+    On-disk cache of a_star() results in directory, with a maximum total size of max_bytes. Use
+    SolutionCache.a_star() instead of a_star().
+    """
+
+    def __init__(self, directory, max_bytes=100 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, start_set, goal, models, max_iteration, **kwargs):
+        """
+        Returns the key (a sha256 hex digest) for a search with these arguments, in the current state of all graphs
+        and tables.
+        """
+        bound = inspect.signature(a_star).bind(start_set, goal, models, max_iteration, **kwargs)
+        bound.apply_defaults()
+
+        parts = ["start set"] + sorted(_data_description(d) for d in start_set.set_of_sources)
+        parts += ["start path", _value_description(start_set.path)]
+        parts += ["goal", _data_description(goal)]
+        parts += ["models"] + [_model_description(m) for m in models]
+        parts += ["aggregation graphs"] + sorted(_graph_description(g) for g in AggregationGraph.instances)
+        parts += ["conversion graphs"] + sorted(_graph_description(g) for g in ConversionGraph.instances)
+        parts += ["aggregation tables"] + sorted(_table_description(t) for t in AggregationTable.instances)
+        parts += ["parameters"] + [name + "=" + _parameter_description(value)
+                                   for name, value in sorted(bound.arguments.items())
+                                   if name not in IGNORED_PARAMETERS]
+
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def get(self, key):
+        # returns the stored result, or None
+        file_name = self._file(key)
+        try:
+            with open(file_name, "rb") as f:
+                result = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(file_name)  # mark as recently used
+        return result
+
+    def put(self, key, result):
+        # write to a temporary file first, so a result is never read while it is only partly written
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(_flatten(result), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, self._file(key))
+        self.evict()
+
+    def evict(self):
+        # remove the least recently used results until the cache fits in max_bytes
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                os.remove(entry.path)
+
+    def a_star(self, start_set, goal, models, max_iteration, **kwargs):
+        """
+        Same as a_star(), but returns the stored result if the same search was done before. Searches with a budget
+        (see SearchBudget) are not cached, because their result depends on the time they were given.
+        """
+        if kwargs.get("budget") is not None:
+            return a_star(start_set, goal, models, max_iteration, **kwargs)
+
+        # the key is computed before the single use models are applied (a_star() applies them)
+        key = self.key(start_set, goal, models, max_iteration, **kwargs)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            # apply the single use models anyway, they change the graphs just like a search would
+            for m in models:
+                if isinstance(m, ModelSingleUse):
+                    m.apply()
+            return result
+
+        self.misses += 1
+        result = a_star(start_set, goal, models, max_iteration, **kwargs)
+        self.put(key, result)
+        return result
@@ -0,0 +1,138 @@
+"""
+# Search statistics
+A SearchStats object records where an A* search spends its time, without changing the code of the search: pass it
+to a_star() with the stats parameter. It keeps the accumulated time and number of calls of each phase of the
+search, counters (expansions, generated and duplicate neighbours, solutions), the size of the open and closed lists
+over time and (optionally) the peak memory use. Observers are called with the SearchStats object during the search,
+for example to log progress or to plot the frontier size while the search is running.
+
+The phases are:
+    - prep_rhs: preprocessing of the right-hand side variables (mostly deep copies of the start set)
+    - scoring: similarity scores of new sets of sources
+    - models: finding neighbours by modelling
+    - regular: finding neighbours by conversion, aggregation and combination (this includes the deep copies of
+      the data sources, see Data.get_neighbours())
+    - lazy: taking the next neighbours from a NeighbourStream (with lazy_neighbours, instead of models and regular),
+      this includes the deep copies of the data sources
+    - branching: creating the new sets of sources from the neighbours (see SetOfSources.branch()). This is the
+      "deepcopy" phase of earlier versions of the search, which made a deep copy of the current set of sources
+      for each neighbour; branch() gives the same set of sources without copying, so the phase was renamed.
+    - duplicates: checking if a new set of sources is already in the open list, closed list or new neighbours
+    - goal_test: checking if the current set of sources contains the goal
+
+The time of a phase does not include the time of the phases that run inside it (branching and duplicates run inside
+lazy), so the times of all phases add up to at most the total time.
+"""
+
+import contextlib
+import time
+import tracemalloc
+
+
+class SearchStats:
+    """
+    Statistics of a search. sample_interval: the open and closed list sizes are recorded (and the observers are
+    called) every sample_interval iterations. track_memory: record the peak memory use with tracemalloc, which slows
+    the search down somewhat. observers: functions that are called with this SearchStats object.
+    """
+
+    def __init__(self, sample_interval=1, track_memory=False, observers=[]):
+        self.sample_interval = sample_interval
+        self.track_memory = track_memory
+        self.observers = list(observers)
+
+        self.phase_time = {}  # phase -> accumulated seconds
+        self.phase_calls = {}  # phase -> number of calls
+        self.nested_time = []  # for each phase that is running: seconds spent in the phases inside it
+        self.counters = {}  # name -> count
+        self.frontier = []  # (iteration, elapsed seconds, length open list, length closed list)
+        self.peak_memory = None  # bytes, if track_memory
+        self.start_time = None
+        self.elapsed = 0
+        self.started_tracemalloc = False
+
+    def start(self):
+        # called by a_star() when the search starts
+        self.start_time = time.perf_counter()
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracemalloc = True
+            tracemalloc.reset_peak()
+
+    def stop(self):
+        # called by a_star() when the search ends
+        self.elapsed += time.perf_counter() - self.start_time
+        self.start_time = None
+        if self.track_memory and tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory or 0, tracemalloc.get_traced_memory()[1])
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+                self.started_tracemalloc = False
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # accumulate the time spent in the with block under name, except the time of the phases inside it (it is
+        # added to the phase around this one instead)
+        t = time.perf_counter()
+        self.nested_time.append(0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t
+            self.phase_time[name] = self.phase_time.get(name, 0) + elapsed - self.nested_time.pop()
+            self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+            if self.nested_time:
+                self.nested_time[-1] += elapsed
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def sample(self, iteration, open_list, closed_list):
+        # called by a_star() at the start of each iteration
+        if iteration % self.sample_interval == 0:
+            self.frontier.append((iteration, self.total_time(), len(open_list), len(closed_list)))
+            if self.track_memory and tracemalloc.is_tracing():
+                self.peak_memory = max(self.peak_memory or 0, tracemalloc.get_traced_memory()[1])
+            for observer in self.observers:
+                observer(self)
+
+    def total_time(self):
+        # seconds spent in the search so far (over all searches, if the object was used more than once)
+        if self.start_time is None:
+            return self.elapsed
+        return self.elapsed + time.perf_counter() - self.start_time
+
+    def expansions_per_second(self):
+        total = self.total_time()
+        return self.counters.get("expansions", 0) / total if total > 0 else 0
+
+    def to_dict(self):
+        return {
+            "total_time": self.total_time(),
+            "expansions_per_second": self.expansions_per_second(),
+            "phase_time": dict(self.phase_time),
+            "phase_calls": dict(self.phase_calls),
+            "counters": dict(self.counters),
+            "frontier": list(self.frontier),
+            "peak_memory": self.peak_memory,
+        }
+
+    def __str__(self):
+        total = self.total_time()
+        lines = ["Search time: " + str(round(total, 4)) + " s, " +
+                 str(round(self.expansions_per_second(), 1)) + " expansions per second"]
+        for name, t in sorted(self.phase_time.items(), key=lambda item: -item[1]):
+            share = 100 * t / total if total > 0 else 0
+            lines.append("   " + name + ": " + str(round(t, 4)) + " s (" + str(round(share, 1)) + "%), " +
+                         str(self.phase_calls[name]) + " calls")
+        for name, n in sorted(self.counters.items()):
+            lines.append("   " + name + ": " + str(n))
+        if self.frontier:
+            lines.append("   Largest open list: " + str(max(f[2] for f in self.frontier)))
+        if self.peak_memory is not None:
+            lines.append("   Peak memory: " + str(round(self.peak_memory / 2**20, 2)) + " MiB")
+        return "\n".join(lines)
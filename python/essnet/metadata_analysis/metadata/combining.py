@@ -18,8 +18,10 @@ def combines(data1: Data, data2: Data):
             left3 = set(data1.left_variables).intersection(set(data2.left_variables))  # intersection of L1 and L2
             units_3 = data1.set_of_units.union(data2.set_of_units)  # union of C1 and C3
             
-            rowwise = Data(right_variables = right3, left_variables = left3, set_of_units = units_3,
-                           name = "combine ("+data1.name+"+"+data2.name+")")
+            # the union is False if it is not possible (for sets of units of different unit types)
+            if units_3:
+                rowwise = Data(right_variables = right3, left_variables = left3, set_of_units = units_3,
+                               name = "combine ("+data1.name+"+"+data2.name+")")
             
         # column-wise combination 
         if units_3:= data1.set_of_units.intersection(data2.set_of_units):
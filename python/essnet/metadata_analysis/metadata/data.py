@@ -10,8 +10,7 @@ from typing import Union
 
 from metadata_analysis.metadata.aggregation import AggregationGraph
 from metadata_analysis.metadata.conversion import ConversionGraph
-from metadata_analysis.metadata.variable import Variable
-from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits, SetOfIncludedUnitsUnion
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits, SetOfIncludedUnitsUnion, units_key
 from metadata_analysis.metadata.path_step import Step
 
 class Data(object):
@@ -23,10 +22,18 @@ class Data(object):
         self.score = False 
         self.name = name  # string: for printing a path that's easy to understand
         self.description = description  # string: a longer description that indicates the variables included in the data set
+        self._fingerprint = None  # cached by fingerprint()
         
     def __str__(self):
         full_str = self.name + " " + self.str_notation()
         return full_str
+
+    def __getstate__(self):
+        # the cached fingerprint is based on hash() of strings, which differs between Python processes, so it is 
+        # not pickled (or copied) along with the data set
+        state = self.__dict__.copy()
+        state["_fingerprint"] = None
+        return state
     
     def __eq__(self, other: "Data"):
         # compare self Data object to the other Data object
@@ -51,6 +58,23 @@ class Data(object):
 
         return hash(str(str_no_name))
     
+    def fingerprint(self):
+        """
+        Canonical, order-independent fingerprint of the data set: its variables and the contents of its set of
+        included units (see units_key(), the name is not used). It is computed once and cached. Data sets with the
+        same variables and sets of included units with the same contents have the same fingerprint, but __eq__()
+        also finds sets of included units equal that are described differently (for example at another
+        granularity), and those can have other fingerprints. Data sets with the same fingerprint still need to be
+        compared with __eq__().
+        """
+        # The cache remembers for which set of included units it was computed, because models overwrite the 
+        # set_of_units of (deep) copies of their output data.
+        if self._fingerprint is None or self._fingerprint[0] is not self.set_of_units:
+            fingerprint = hash((frozenset(self.left_variables), frozenset(self.right_variables),
+                                units_key(self.set_of_units)))
+            self._fingerprint = (self.set_of_units, fingerprint)
+        return self._fingerprint[1]
+
     def str_notation(self):
         left_str_separate = [str(v) for v in self.left_variables]
         left_str_separate.sort()
@@ -120,6 +144,13 @@ class Data(object):
     def reset_score(self):
         # Always make sure to reset the score when making a (deep) copy of a dataset, or if you adjust any variables
         self.score = False
+        self._fingerprint = None
+
+    def with_set_of_units(self, set_of_units):
+        # a copy of self with another set of included units (used for the output of models)
+        data_temp = copy.deepcopy(self)
+        data_temp.set_of_units = set_of_units
+        return data_temp
 
     def convert_variable(self, var_remove, var_add):
         if var_remove.name != var_add.name:
@@ -147,7 +178,7 @@ class Data(object):
                          method_detail=method_detail,
                          input=str(self_input),
                          output=str(self))
-        self.score = False
+        self.reset_score()
 
         return path_step
 
@@ -179,7 +210,7 @@ class Data(object):
                          method_detail=method_detail,
                          input=str(self_input),
                          output=str(self))
-        self.score = False
+        self.reset_score()
 
         return path_step
     
@@ -189,102 +220,119 @@ class Data(object):
         # other is the goal Data
         
         if not self.score: # only calculate the score if it is not known yet
-
-            n_goal_vars_left = len(self.left_variables)
-                
-            left_equal = len(set(self.left_variables).intersection(other.left_variables))  # number of variables with equal name and granularity
-            right_equal = len(set(self.right_variables).intersection(other.right_variables))  # number of variables with equal name and granularity
-            
-            left_similar = len(self.get_variable_names_left().intersection(other.get_variable_names_left()))  # number of variables with equal name (those with equal granularity are counted again, so keep this in mind when setting weights)
-            left_similar -= left_equal    # remove double-counting
-            right_similar = len(self.get_variable_names_right().intersection(other.get_variable_names_right()))  # number of variables with equal name (those with equal granularity are counted again, so keep this in mind when setting weights)
-            right_similar -= right_equal  # remove double-counting
-        
-            units_score = weight_units*(self.set_of_units == other.set_of_units)
-            
-            left_equal_max = len(set(other.left_variables))  # number of variables with equal name and granularity
-            right_equal_max = len(set(other.right_variables))  # number of variables with equal name and granularity
-
-            base_score = sum([weight_left_eq*left_equal, weight_left_sim*left_similar,
-                            weight_right_eq*right_equal, weight_right_sim*right_similar,
-                            units_score])
-            
-            
-            if variant == "base":
-                # simply sum the multiplications of the variable weights
-                self.score = base_score
-            elif variant == "base_coupled":
-                # simply sum the multiplications of the variable weights
-                self.score = (sum([weight_left_eq*left_equal, weight_left_sim*left_similar]) *
-                        sum([weight_right_eq*right_equal, weight_right_sim*right_similar, units_score]))
-            elif variant == "individual":
-                # named "likeness" in the paper
-                # this may be a little slower because of the for loop, but it will keep the algorithm from adding unneccesary variables to datasets
-                # This similarity function is assymetric. It assumes that other is the goal and self is a dataset from one of the stages in the algorithm
-
-                score_tmp = 0  # Initialize score
-
-                # left hand side                    
-                for goal_v_l in other.left_variables:
-                    if goal_v_l in self.left_variables: 
-                        # an exact match on granularity is present
-                        score_tmp += weight_left_eq
-
-                    elif goal_v_l.name in self.get_variable_names_left():
-                        # similar match on variable name (wihtout granularity)
-                        score_tmp += weight_left_sim
-
-                # right hand side
-                for goal_v_r in other.right_variables:
-                    if goal_v_r in self.right_variables: 
-                        # an exact match on granularity is present
-                        score_tmp += weight_right_eq
-
-                    elif goal_v_r.name in self.get_variable_names_right():
-                        # similar match on variable name  (wihtout granularity)
-                        score_tmp += weight_right_sim
-
-                if other.set_of_units == self.set_of_units:
-                    score_tmp += units_score
-
-                # penalize sources that have more variables in them 
-                score_tmp = score_tmp / (len(set(self.left_variables)) + len(set(self.right_variables)))
-                self.score = score_tmp
-
-            elif variant == "normalized":   # this is the default
-                # normalize score:
-                # by dividing by the maximum score that could be acchieved based on the number of variables in this source
-                # large sources gain a higher penalty
-                self.score = base_score / sum([weight_left_eq * left_equal_max, weight_right_eq * right_equal_max, weight_units])
-            
-            elif variant == "normalized_coupled":
-                # normalize score, but with rhs and lhs dependently (multiply instead of sum)
-                self.score = ((sum([weight_left_eq*left_equal, weight_left_sim*left_similar]) *
-                        sum([weight_right_eq*right_equal, weight_right_sim*right_similar, units_score])) /  
-                        (weight_left_eq * left_equal_max * (weight_right_eq * right_equal_max + weight_units)))
+            self.score = self.similarity_score(other, variant, weight_right_sim, weight_right_eq, weight_left_sim,
+                                               weight_left_eq, weight_units)
             if prints: 
                 print("   Score for a new data set: "+str(self)+" and other (goal): "+str(other)+ ". Score: "+str(self.score))
 
         return self.score
+
+    def similarity_score(self, other: "Data", variant = "base",
+                         weight_right_sim = 1, weight_right_eq = 5, weight_left_sim = 2, weight_left_eq = 5,
+                         weight_units = 5):
+        # the score of similarity(), computed every time: it is not kept in self.score (other is the goal Data)
+        score = False  # for an unknown variant
+
+        n_goal_vars_left = len(self.left_variables)
+            
+        left_equal = len(set(self.left_variables).intersection(other.left_variables))  # number of variables with equal name and granularity
+        right_equal = len(set(self.right_variables).intersection(other.right_variables))  # number of variables with equal name and granularity
+        
+        left_similar = len(self.get_variable_names_left().intersection(other.get_variable_names_left()))  # number of variables with equal name (those with equal granularity are counted again, so keep this in mind when setting weights)
+        left_similar -= left_equal    # remove double-counting
+        right_similar = len(self.get_variable_names_right().intersection(other.get_variable_names_right()))  # number of variables with equal name (those with equal granularity are counted again, so keep this in mind when setting weights)
+        right_similar -= right_equal  # remove double-counting
+    
+        units_score = weight_units*(self.set_of_units == other.set_of_units)
+        
+        left_equal_max = len(set(other.left_variables))  # number of variables with equal name and granularity
+        right_equal_max = len(set(other.right_variables))  # number of variables with equal name and granularity
+
+        base_score = sum([weight_left_eq*left_equal, weight_left_sim*left_similar,
+                        weight_right_eq*right_equal, weight_right_sim*right_similar,
+                        units_score])
+        
+        
+        if variant == "base":
+            # simply sum the multiplications of the variable weights
+            score = base_score
+        elif variant == "base_coupled":
+            # simply sum the multiplications of the variable weights
+            score = (sum([weight_left_eq*left_equal, weight_left_sim*left_similar]) *
+                    sum([weight_right_eq*right_equal, weight_right_sim*right_similar, units_score]))
+        elif variant == "individual":
+            # named "likeness" in the paper
+            # this may be a little slower because of the for loop, but it will keep the algorithm from adding unneccesary variables to datasets
+            # This similarity function is assymetric. It assumes that other is the goal and self is a dataset from one of the stages in the algorithm
+
+            score_tmp = 0  # Initialize score
+
+            # left hand side                    
+            for goal_v_l in other.left_variables:
+                if goal_v_l in self.left_variables: 
+                    # an exact match on granularity is present
+                    score_tmp += weight_left_eq
+
+                elif goal_v_l.name in self.get_variable_names_left():
+                    # similar match on variable name (wihtout granularity)
+                    score_tmp += weight_left_sim
+
+            # right hand side
+            for goal_v_r in other.right_variables:
+                if goal_v_r in self.right_variables: 
+                    # an exact match on granularity is present
+                    score_tmp += weight_right_eq
+
+                elif goal_v_r.name in self.get_variable_names_right():
+                    # similar match on variable name  (wihtout granularity)
+                    score_tmp += weight_right_sim
+
+            if other.set_of_units == self.set_of_units:
+                score_tmp += units_score
+
+            # penalize sources that have more variables in them 
+            score_tmp = score_tmp / (len(set(self.left_variables)) + len(set(self.right_variables)))
+            score = score_tmp
+
+        elif variant == "normalized":   # this is the default
+            # normalize score:
+            # by dividing by the maximum score that could be acchieved based on the number of variables in this source
+            # large sources gain a higher penalty
+            score = base_score / sum([weight_left_eq * left_equal_max, weight_right_eq * right_equal_max, weight_units])
+        
+        elif variant == "normalized_coupled":
+            # normalize score, but with rhs and lhs dependently (multiply instead of sum)
+            score = ((sum([weight_left_eq*left_equal, weight_left_sim*left_similar]) *
+                    sum([weight_right_eq*right_equal, weight_right_sim*right_similar, units_score])) /  
+                    (weight_left_eq * left_equal_max * (weight_right_eq * right_equal_max + weight_units)))
+        return score
     
     def get_neighbours(self, agg = True):
         # based on conversion and aggregation, give all unique datasets that can be created from datasource self, with exactly one manipulation
-        
-        # conversion
         neighbours = []
         path_steps = []
+        for move in self.neighbour_moves(agg):
+            data_temp, path_step_tmp = self.apply_move(move)
+            neighbours.append(data_temp)
+            path_steps.append(path_step_tmp)
+                    
+        # combination is not relevant when looking at a single data source, because two sources are always required for combining
+        
+        return neighbours, path_steps
+
+    def neighbour_moves(self, agg = True):
+        # the conversions and aggregations of get_neighbours(), as (method, variable, new variable) tuples, without 
+        # copying the data set (see apply_move())
+        moves = []
+
+        # conversion
         for v in self.left_variables:
             # for each of the left variables, it can be converted to one of its connected granularities in the conversion graph
             conversion_graph = ConversionGraph.get(v.name)
             connected_granularities = conversion_graph.all_conversions(v.granularity)
             for g in connected_granularities:
-                v2 = Variable(name=v.name, granularity = g)  # copy the name, but use new granularity
-                data_temp = copy.deepcopy(self)  # copy of the current data set
-                # * denotes: some change was made to the original data set
-                data_temp.name = self.name + "*"
-                path_step_tmp = data_temp.convert_variable(var_remove = v, var_add = v2)  # apply conversion (we have checked that it is valid when creating connected_granularities)
-                neighbours.append(data_temp)
-                path_steps.append(path_step_tmp)
+                v2 = v.with_granularity(g)  # copy the name, but use new granularity
+                moves.append(("conversion", v, v2))
         
         # aggregation 
         if agg:
@@ -294,15 +342,36 @@ class Data(object):
                 connected_granularities = aggregation_graph.all_aggregations(v.granularity)
 
                 for g in connected_granularities:
-                    v2 = Variable(name=v.name, granularity = g)  # copy the name, but use new granularity
-                    data_temp = copy.deepcopy(self)
-                    path_step_tmp = data_temp.aggregate_variable(var_remove=v, var_add=v2)
-                    neighbours.append(data_temp)
-                    path_steps.append(path_step_tmp)
-                    
-        # combination is not relevant when looking at a single data source, because two sources are always required for combining
-        
-        return neighbours, path_steps
+                    v2 = v.with_granularity(g)  # copy the name, but use new granularity
+                    moves.append(("aggregation", v, v2))
+
+        return moves
+
+    def apply_move(self, move):
+        # the neighbour of self after a move of neighbour_moves(), and its path step
+        method, v, v2 = move
+        data_temp = copy.deepcopy(self)  # copy of the current data set
+        if method == "conversion":
+            # * denotes: some change was made to the original data set
+            data_temp.name = self.name + "*"
+            path_step_tmp = data_temp.convert_variable(var_remove = v, var_add = v2)  # apply conversion (we have checked that it is valid when creating connected_granularities)
+        else:
+            path_step_tmp = data_temp.aggregate_variable(var_remove=v, var_add=v2)
+        return data_temp, path_step_tmp
+
+    def move_relevance(self, move, goal: "Data"):
+        # estimate of how much a move of neighbour_moves() helps to reach the goal (higher is better), without 
+        # applying it: +1 if the new variable is in the goal, -1 if the old variable was. An aggregation after which
+        # the granularity of the goal can no longer be reached gets -1 as well.
+        method, v, v2 = move
+        goal_variables = goal.left_variables if method == "conversion" else goal.right_variables
+        relevance = (v2 in goal_variables) - (v in goal_variables)
+        if method == "aggregation" and v2 not in goal_variables:
+            goal_granularities = [w.granularity for w in goal_variables if w.name == v.name]
+            reachable = AggregationGraph.get(v.name).all_aggregations(v2.granularity)
+            if goal_granularities and not any(g in reachable for g in goal_granularities):
+                relevance -= 1
+        return relevance
     
     def shrink(self, other: "Data"): 
         """
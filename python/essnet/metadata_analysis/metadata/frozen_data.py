@@ -0,0 +1,197 @@
+"""
+An immutable variant of Data. The variables are frozensets, and the hash, fingerprint and notation are computed
+once, when the data set is created. FrozenData objects are interned: creating a data set that is structurally
+identical to an existing one (the same left- and right-hand side variables and set of included units) returns the
+existing object, so equal data sets are usually the same object and __eq__() is a pointer check. The name of an
+interned data set is the name it was first created with.
+
+Conversions and aggregations (converted(), aggregated() and apply_move()) return a new (interned) data set instead
+of changing the data set in place, and copies of a FrozenData object are the object itself. The similarity scores are kept in the data set, per goal
+(because the data set is shared by all searches), and can be reset with reset_score(). Use FrozenData.freeze(), freeze_set_of_sources() and freeze_models() to switch an
+existing case to frozen data sets, the search works the same for both.
+"""
+
+import weakref
+from typing import Union
+
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.aggregation import AggregationGraph
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.model import Model, ModelSingleUse
+from metadata_analysis.metadata.path_step import Step
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits, SetOfIncludedUnitsUnion, units_key
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.similarity_memo import data_key
+
+# attributes that cannot be changed after a FrozenData object was created
+FROZEN_ATTRIBUTES = ["left_variables", "right_variables", "set_of_units", "name", "description"]
+
+
+class FrozenData(Data):
+    # interning table: (left variables, right variables, set of included units) -> FrozenData. Data sets that are no
+    # longer used anywhere else are removed from the table.
+    instances = weakref.WeakValueDictionary()
+
+    def __new__(cls, left_variables, right_variables,
+                set_of_units: Union['SetOfIncludedUnits', 'SetOfIncludedUnitsUnion'], name="", description=""):
+        key = (frozenset(left_variables), frozenset(right_variables), set_of_units)
+        existing = cls.instances.get(key)
+        if existing is not None:
+            return existing
+
+        self = super().__new__(cls)
+        self.__dict__.update(left_variables=key[0], right_variables=key[1], set_of_units=set_of_units, name=name,
+                             description=description, score=False, scores={})
+
+        # everything that Data computes again on every call
+        left_str = ", ".join(sorted(str(v) for v in self.left_variables))
+        right_str = ", ".join(sorted(str(v) for v in self.right_variables))
+        self.__dict__.update(
+            _hash=hash(" (" + left_str + " | " + right_str + ")" + set_of_units.name),
+            _notation="(" + left_str + " | " + right_str + ")" + "_" + set_of_units.name,
+            _fingerprint_value=hash((self.left_variables, self.right_variables, units_key(set_of_units))),
+            _names_left=frozenset(v.name for v in self.left_variables),
+            _names_right=frozenset(v.name for v in self.right_variables))
+
+        cls.instances[key] = self
+        return self
+
+    def __init__(self, *args, **kwargs):
+        # everything is set in __new__(), also when an existing data set is returned
+        pass
+
+    @classmethod
+    def freeze(cls, data: Data):
+        # the FrozenData version of a Data object
+        if isinstance(data, FrozenData):
+            return data
+        return cls(data.left_variables, data.right_variables, data.set_of_units, name=data.name,
+                   description=data.description)
+
+    def __setattr__(self, name, value):
+        if name in FROZEN_ATTRIBUTES:
+            raise AttributeError("FrozenData is immutable, " + name + " cannot be changed.")
+        super().__setattr__(name, value)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # pickling (for checkpoints and worker processes) interns the data set again when it is loaded
+        return (FrozenData, (self.left_variables, self.right_variables, self.set_of_units, self.name,
+                             self.description))
+
+    def __str__(self):
+        return self.name + " " + self._notation
+
+    def __eq__(self, other: "Data"):
+        if self is other:
+            return True
+        # different interned objects always differ in their variables, or in their set of included units (which can
+        # still be equal if they are described differently)
+        return (self.left_variables == other.left_variables and self.right_variables == other.right_variables and
+                self.set_of_units == other.set_of_units)
+
+    def __hash__(self):
+        return self._hash
+
+    def fingerprint(self):
+        return self._fingerprint_value
+
+    def str_notation(self):
+        return self._notation
+
+    def get_variable_names_left(self):
+        return self._names_left
+
+    def get_variable_names_right(self):
+        return self._names_right
+
+    def reset_score(self):
+        self.score = False
+        self.scores = {}
+
+    def similarity(self, other: "Data", variant = "base", prints=False,
+                   weight_right_sim = 1, weight_right_eq = 5, weight_left_sim = 2, weight_left_eq = 5,
+                   weight_units = 5):
+        # Data.similarity() keeps a single score, whatever other (the goal) is. An interned data set is shared by all
+        # searches, so its scores are kept per goal (by its contents, see data_key()), variant and weights.
+        key = (data_key(other), variant, weight_right_sim, weight_right_eq, weight_left_sim, weight_left_eq,
+               weight_units)
+        if key not in self.scores:
+            self.score = False
+            self.scores[key] = super().similarity(other, variant, prints, weight_right_sim, weight_right_eq,
+                                                  weight_left_sim, weight_left_eq, weight_units)
+        self.score = self.scores[key]
+        return self.score
+
+    def with_set_of_units(self, set_of_units):
+        return FrozenData(self.left_variables, self.right_variables, set_of_units, name=self.name,
+                          description=self.description)
+
+    def convert_variable(self, var_remove, var_add):
+        raise AttributeError("FrozenData is immutable, use converted() instead of convert_variable().")
+
+    def aggregate_variable(self, var_remove, var_add):
+        raise AttributeError("FrozenData is immutable, use aggregated() instead of aggregate_variable().")
+
+    def converted(self, var_remove, var_add):
+        """
+        Returns the data set with var_remove converted into var_add (a new, interned FrozenData object) and the path
+        step, or None if the variables differ. Data.convert_variable() changes the data set in place instead.
+        """
+        if var_remove.name != var_add.name:
+            # we can only convert within the same variable
+            return None
+        data_new = FrozenData((self.left_variables - {var_remove}) | {var_add}, self.right_variables,
+                              self.set_of_units, name=self.name + "*", description=self.description)
+        method_name, method_detail = ConversionGraph.get(var_remove.name).get_path_detail(
+            var_remove.granularity, var_add.granularity)
+        return data_new, Step(method=method_name, method_detail=method_detail, input=str(self), output=str(data_new))
+
+    def aggregated(self, var_remove, var_add):
+        """
+        Returns the data set with var_remove aggregated into var_add (a new, interned FrozenData object) and the path
+        step, or None if the variables differ. Data.aggregate_variable() changes the data set in place instead.
+        """
+        if var_remove.name != var_add.name:
+            # we can only aggregate within the same variable
+            return None
+        data_new = FrozenData(self.left_variables, (self.right_variables - {var_remove}) | {var_add},
+                              self.set_of_units, name=self.name + "*", description=self.description)
+        method_name, method_detail = AggregationGraph.get(var_remove.name).get_path_detail(
+            var_remove.granularity, var_add.granularity)
+        return data_new, Step(method=method_name, method_detail=method_detail, input=str(self), output=str(data_new))
+
+    def apply_move(self, move):
+        method, v, v2 = move
+        if method == "conversion":
+            return self.converted(var_remove=v, var_add=v2)
+        return self.aggregated(var_remove=v, var_add=v2)
+
+
+def freeze_set_of_sources(set_of_sources):
+    # a SetOfSources with the FrozenData versions of the data sources of set_of_sources (a SetOfSources or a list)
+    sources = set_of_sources.set_of_sources if isinstance(set_of_sources, SetOfSources) else set_of_sources
+    return SetOfSources([FrozenData.freeze(d) for d in sources])
+
+
+def freeze_models(models):
+    """
+    Replaces the input data of the models by FrozenData versions (in place), and returns the models. The output data
+    is only replaced for models that use Model.apply(): models with their own apply() (as in the notebooks) usually
+    copy their output data and change the copy, so their output stays a Data object.
+    """
+    for m in models:
+        if isinstance(m, ModelSingleUse):
+            continue
+        m.input_data = type(m.input_data)(FrozenData.freeze(d) for d in m.input_data)
+        if type(m).apply is Model.apply:
+            if isinstance(m.output_data, list):
+                m.output_data = [FrozenData.freeze(d) for d in m.output_data]
+            else:
+                m.output_data = FrozenData.freeze(m.output_data)
+    return models
@@ -0,0 +1,189 @@
+"""
+Compact, interned variants of Variable and VariableSpec. Each variable name gets an integer id, and there is only
+one InternedVariable object for each (name id, granularity) pair, and one InternedVariableSpec for each (name id,
+granularity, available values). So equality is an identity check, and the hash is computed once, when the object is
+created (the values of an InternedVariableSpec are a frozenset). The objects use __slots__ and cannot be changed;
+copies of them are the objects themselves.
+
+The hashes are the same as those of Variable and VariableSpec, and an interned object is equal to a plain object
+with the same name, granularity (and values), so both can be mixed in sets of variables and sets of included units.
+The strings are only made for display. Use intern_variables() to switch the data sources of an existing case to
+interned variables (before FrozenData.freeze(), if frozen data sets are used as well).
+"""
+
+import weakref
+
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.metadata.variable_spec import VariableSpec
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+
+# integer id of each variable name, in order of first use
+NAME_IDS = {}
+
+
+def _name_id(name):
+    return NAME_IDS.setdefault(name, len(NAME_IDS))
+
+
+class InternedVariable:
+    __slots__ = ("name", "granularity", "name_id", "_hash", "__weakref__")
+
+    # (name id, granularity) -> InternedVariable, there are only a few (number of names times number of granularities)
+    instances = {}
+
+    def __new__(cls, name = "dummy", granularity = 0):
+        key = (_name_id(name), granularity)
+        existing = cls.instances.get(key)
+        if existing is not None:
+            return existing
+        self = super().__new__(cls)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "granularity", granularity)
+        object.__setattr__(self, "name_id", key[0])
+        object.__setattr__(self, "_hash", hash(str(name) + str(granularity)))  # the same as Variable.__hash__()
+        cls.instances[key] = self
+        return self
+
+    @classmethod
+    def intern(cls, v: "Variable"):
+        # the interned version of a Variable
+        if isinstance(v, InternedVariable):
+            return v
+        return cls(v.name, v.granularity)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("InternedVariable is immutable, " + name + " cannot be changed.")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # pickling interns the variable again when it is loaded (the name ids differ between processes)
+        return (InternedVariable, (self.name, self.granularity))
+
+    def __str__(self):
+        return str(self.name) + str(self.granularity)
+
+    def __eq__(self, other: "Variable"):
+        if self is other:
+            return True
+        if isinstance(other, InternedVariable):
+            return False
+        return self.name == other.name and self.granularity == other.granularity
+
+    def __hash__(self):
+        return self._hash
+
+    def equal_name(self, other: "Variable"):
+        if isinstance(other, InternedVariable):
+            return self.name_id == other.name_id
+        return self.name == other.name
+
+    def with_granularity(self, granularity):
+        return InternedVariable(self.name, granularity)
+
+
+class InternedVariableSpec:
+    __slots__ = ("name", "granularity", "value_available", "name_id", "_hash", "__weakref__")
+
+    # (name id, granularity, values) -> InternedVariableSpec, only while the object is used somewhere else
+    instances = weakref.WeakValueDictionary()
+
+    def __new__(cls, name, granularity, value_available = frozenset()):
+        key = (_name_id(name), granularity, frozenset(value_available))
+        existing = cls.instances.get(key)
+        if existing is not None:
+            return existing
+        self = super().__new__(cls)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "granularity", granularity)
+        object.__setattr__(self, "value_available", key[2])
+        object.__setattr__(self, "name_id", key[0])
+        object.__setattr__(self, "_hash", hash(VariableSpec.__str__(self)))  # the same as VariableSpec.__hash__()
+        cls.instances[key] = self
+        return self
+
+    @classmethod
+    def intern(cls, v: "VariableSpec"):
+        # the interned version of a VariableSpec (False, for a failed intersection or union, stays False)
+        if v is False or isinstance(v, InternedVariableSpec):
+            return v
+        return cls(v.name, v.granularity, v.value_available)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("InternedVariableSpec is immutable, " + name + " cannot be changed.")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (InternedVariableSpec, (self.name, self.granularity, self.value_available))
+
+    __str__ = VariableSpec.__str__
+
+    def __eq__(self, other: "VariableSpec"):
+        if self is other:
+            return True
+        if isinstance(other, InternedVariableSpec):
+            return False
+        return (self.name == other.name and self.granularity == other.granularity and
+                self.value_available == other.value_available)
+
+    def __hash__(self):
+        return self._hash
+
+    # the set operations of VariableSpec only read the name, granularity and values
+    equal_name = Variable.equal_name
+    is_complete = VariableSpec.is_complete
+    is_subset = VariableSpec.is_subset
+
+    def mutable(self):
+        # a plain VariableSpec with a (mutable) set of values
+        return VariableSpec(self.name, self.granularity, set(self.value_available))
+
+    def intersection(self, other: "VariableSpec"):
+        # VariableSpec.intersection() and union() build their result in a set, from mutable copies of the values
+        return InternedVariableSpec.intern(VariableSpec.intersection(self.mutable(), _mutable(other)))
+
+    def union(self, other: "VariableSpec"):
+        return InternedVariableSpec.intern(VariableSpec.union(self.mutable(), _mutable(other)))
+
+    def with_granularity(self, granularity):
+        return InternedVariable(self.name, granularity)
+
+
+def _mutable(v):
+    return v.mutable() if isinstance(v, InternedVariableSpec) else v
+
+
+def _intern_set_of_units(set_of_units, done):
+    # replaces the variables of a set of included units (and of the parts of a union) in place, once per object
+    if id(set_of_units) in done:
+        return
+    done[id(set_of_units)] = set_of_units
+    for soiu in getattr(set_of_units, "set_of_soiu", []):
+        _intern_set_of_units(soiu, done)
+    set_of_units.unit_type_var = InternedVariable.intern(set_of_units.unit_type_var)
+    set_of_units.specifying_variables = {InternedVariableSpec.intern(v) for v in set_of_units.specifying_variables}
+
+
+def intern_variables(data_sets):
+    """
+    Replaces the variables of the data sets (Data objects, for example the data sources of a start set, the goal
+    and the input and output data of models) and of their sets of included units by interned variables, in place.
+    The hashes stay the same, so sets of data sources that contain the data sets remain valid. Returns data_sets.
+    """
+    done = {}
+    for d in data_sets:
+        d.left_variables = {InternedVariable.intern(v) for v in d.left_variables}
+        d.right_variables = {InternedVariable.intern(v) for v in d.right_variables}
+        if isinstance(d.set_of_units, SetOfIncludedUnits):
+            _intern_set_of_units(d.set_of_units, done)
+        d.reset_score()
+    return data_sets
@@ -119,8 +119,8 @@ class Model:
         
                     if units_new:
                         # Now, we can generate an output of the model.
-                        output_data_temp = copy.deepcopy(self.output_data)  # copy the output_data
-                        output_data_temp.set_of_units = units_new  # overwrite the set of included units
+                        # copy the output_data, and overwrite the set of included units
+                        output_data_temp = self.output_data.with_set_of_units(units_new)
                         output_list.append(output_data_temp)  # add to model output
 
                 if len(output_list) > 0:
@@ -0,0 +1,113 @@
+"""
+Running aggregates of the similarity scores of the data sources in a set of sources. They are used by
+SetOfSources.similarity_incremental(): a set of sources created by SetOfSources.branch() differs from its parent
+by exactly one data source, so its score can be derived from the aggregates of the parent instead of being
+recomputed over all data sources.
+"""
+
+# The top scores are kept in a persistent leftist min-heap: a node is a tuple (rank, score, left, right), where rank
+# is the length of the path to the nearest empty subtree (None) on the right. Adding or removing a score only creates
+# the O(log n_top) nodes on a path, all other nodes are shared with the heap it came from.
+
+def _rank(heap):
+    return 0 if heap is None else heap[0]
+
+
+def _node(score, heap1, heap2):
+    # the subtree with the smallest rank goes to the right
+    if _rank(heap1) < _rank(heap2):
+        heap1, heap2 = heap2, heap1
+    return (_rank(heap2) + 1, score, heap1, heap2)
+
+
+def _merge(heap1, heap2):
+    if heap1 is None:
+        return heap2
+    if heap2 is None:
+        return heap1
+    if heap2[1] < heap1[1]:
+        heap1, heap2 = heap2, heap1
+    return _node(heap1[1], heap1[2], _merge(heap1[3], heap2))
+
+
+def _push(heap, score):
+    return _merge(heap, (1, score, None, None))
+
+
+def _pop(heap):
+    # the heap without its smallest score
+    return _merge(heap[2], heap[3])
+
+
+class ScoreAggregates:
+    """
+    Running count, sum, maximum and minimum of a collection of scores, and the n_top highest scores (kept in a
+    bounded persistent min-heap, for similarity_topsum()). Objects are not changed after creation: add() returns a
+    new object, so the aggregates of a parent set of sources can be shared by all of its children. The children also
+    share the heap of the top scores. The sum of the top scores is kept as a running sum, like the sum of all scores,
+    so it can differ in the last digits from the sum in ascending order of SetOfSources.similarity_topsum().
+    """
+
+    def __init__(self, n_top=None):
+        self.n = 0
+        self.total = 0
+        self.maximum = None
+        self.minimum = None
+        self.n_top = n_top  # None if the top scores are not needed
+        self.top = None  # persistent min-heap of the n_top highest scores (see _merge())
+        self.n_in_top = 0  # number of scores in the heap
+        self.top_sum = 0  # sum of the scores in the heap
+
+    @classmethod
+    def from_scores(cls, scores, n_top=None):
+        aggregates = cls(n_top=n_top)
+        for score in scores:
+            aggregates._add_inplace(score)
+        return aggregates
+
+    def add(self, score):
+        # returns new aggregates with score added, O(1) (or O(log n_top) when the top scores are kept)
+        aggregates = ScoreAggregates(n_top=self.n_top)
+        aggregates.n = self.n
+        aggregates.total = self.total
+        aggregates.maximum = self.maximum
+        aggregates.minimum = self.minimum
+        aggregates.top = self.top
+        aggregates.n_in_top = self.n_in_top
+        aggregates.top_sum = self.top_sum
+        aggregates._add_inplace(score)
+        return aggregates
+
+    def _add_inplace(self, score):
+        self.n += 1
+        self.total += score
+        self.maximum = score if self.maximum is None else max(self.maximum, score)
+        self.minimum = score if self.minimum is None else min(self.minimum, score)
+
+        if self.n_top is not None:
+            if self.n_in_top < self.n_top:
+                self.top = _push(self.top, score)
+                self.n_in_top += 1
+                self.top_sum += score
+            elif self.n_in_top > 0 and score > self.top[1]:
+                self.top_sum = self.top_sum - self.top[1] + score
+                self.top = _push(_pop(self.top), score)
+
+    def get(self, similarity_choice):
+        # the score of the set of sources for the similarity score function of choice (see SetOfSources)
+        if similarity_choice == "sum":
+            return self.total
+        elif similarity_choice == "topsum":
+            return self.top_sum
+        elif similarity_choice == "max":
+            return self.maximum
+        elif similarity_choice == "mean":
+            return self.total / self.n
+        elif similarity_choice == "min":
+            return self.minimum
+        elif similarity_choice == "minmax":
+            return self.maximum * self.minimum
+        elif similarity_choice == "maxmean":
+            return self.maximum + self.total / self.n
+        else:
+            raise ValueError("Similarity choice " + str(similarity_choice) + " cannot be derived from running aggregates.")
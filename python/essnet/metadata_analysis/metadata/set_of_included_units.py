@@ -458,4 +458,10 @@ class SetOfIncludedUnitsUnion(SetOfIncludedUnits):
 
         return min_gran
 
-        
\ No newline at end of file
+
+def units_key(set_of_units):
+    # the contents of a set of included units: its unit type and specifying variables (with their values), or the
+    # contents of each part of a union. Sets of included units with the same contents are equal.
+    if hasattr(set_of_units, "set_of_soiu"):
+        return frozenset(units_key(soiu) for soiu in set_of_units.set_of_soiu)
+    return set_of_units.unit_type_var, frozenset(set_of_units.specifying_variables)
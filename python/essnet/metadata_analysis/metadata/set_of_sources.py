@@ -1,10 +1,17 @@
 from metadata_analysis.metadata.data import Data
 from metadata_analysis.metadata.path_step import Step
 from metadata_analysis.metadata.combining import *
+from metadata_analysis.metadata.score_aggregates import ScoreAggregates
 
+import copy as copy
 import numpy as np
 import itertools as itertools
 
+FINGERPRINT_MASK = (1 << 64) - 1  # fingerprints of sets of sources are kept within 64 bits
+
+# similarity score functions that can be derived from running aggregates, see similarity_incremental()
+INCREMENTAL_CHOICES = ["sum", "topsum", "max", "mean", "min", "minmax", "maxmean"]
+
 class SetOfSources:
     """
     Two variants of the similarity score function are implemented: the sum and max of the individual data scores from the data source similarity. 
@@ -15,6 +22,8 @@ class SetOfSources:
         self.path = [Step(method="start set")]  # for keeping track of the path that created the current set
         self.tree = []  # for keeping track of which iterations of the algorithm added to this path
         self.score = False 
+        self._fingerprint = None  # cached by fingerprint()
+        self.memo = {}  # values derived from the set of sources (such as score aggregates), reset when a source is added
         
     def __str__(self):
         full_str = "{" + ",\n ".join(sorted([str(d) for d in self.set_of_sources])) + "\n}"
@@ -27,6 +36,16 @@ class SetOfSources:
         # regardless of order in which the Data objects appear
         return self.set_of_sources == other.set_of_sources
     
+    def fingerprint(self):
+        """
+        Canonical, order-independent fingerprint of the set of sources: the sum of the fingerprints of its data 
+        sources. It is computed once and cached until a data source is added. Sets of sources that are equal have 
+        the same fingerprint, so __eq__() only needs to be evaluated for sets with the same fingerprint.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = sum(d.fingerprint() for d in self.set_of_sources) & FINGERPRINT_MASK
+        return self._fingerprint
+
     def str_nameonly(self):
         full_str = "{" + ",\n ".join(
                     sorted([d.name for d in self.set_of_sources])) + "\n}"
@@ -37,6 +56,34 @@ class SetOfSources:
         self.add_to_path(path_step)
         self.tree.append(iteration)
         self.score = False  # reset score because of change in the set of sources
+        self._fingerprint = None
+        self.memo = {}
+
+    def branch(self, data_new: Data, path_step=Step(), iteration="-1"):
+        """
+        Returns a new set of sources that consists of self with data_new added, and leaves self unchanged. This 
+        gives the same result as a deep copy of self followed by add_data_source(), but the new set shares the 
+        data sources and path of self instead of copying them. See SetOfSourcesChild.
+        """
+        return SetOfSourcesChild(self, data_new, path_step, iteration)
+
+    def shallow_copy(self):
+        """
+        Returns a copy of self that shares the data sources (they are not copied), but has its own path, tree and 
+        memo, so adding a data source to the copy leaves self unchanged.
+        """
+        set_copy = copy.copy(self)
+        set_copy.path = list(self.path)
+        set_copy.tree = list(self.tree)
+        set_copy.memo = {}
+        return set_copy
+
+    def reset_score(self):
+        # reset the scores of self and of all data sources (which are only valid for a single goal)
+        self.score = False
+        self.memo = {}
+        for d in self.set_of_sources:
+            d.reset_score()
 
     def add_to_path(self, path_step: str):
         # For keeping track of the path. 
@@ -53,7 +100,8 @@ class SetOfSources:
         Alternative: contains_shrink().
         """
 
-        return any([data_set == d for d in self.set_of_sources])
+        # only the goal candidates can be equal to data_set
+        return any([data_set == d for d in self.goal_candidates(data_set)])
     
     def contains_shrink(self, other_data_set: Data):
         """
@@ -66,11 +114,17 @@ class SetOfSources:
         #  is not exactly in self
         # We want to include in the path which dataset we should take the "subset" of.
         
+        # only the goal candidates can be shrinked into other_data_set, so only these get the (expensive) check of
+        # the sets of included units
         candidates = []
-        for data_in_self in self.set_of_sources:
+        for data_in_self in self.goal_candidates(other_data_set):
             if data_in_self.shrink(other_data_set):
                 candidates.append(data_in_self)
 
+        if len(candidates)>1:
+            # keep the order of the set of sources (the order of the subset steps in the path)
+            candidate_ids = {id(d) for d in candidates}
+            candidates = [d for d in self.set_of_sources if id(d) in candidate_ids]
         
         if len(candidates)>0:
             # At least one data set can be shrinked to other_data_set. Add the goal to the set, and
@@ -85,6 +139,21 @@ class SetOfSources:
         else:
             return False
 
+    def goal_candidates(self, goal_data: Data):
+        """
+        Returns the data sources whose left and right variables are supersets of those of goal_data. Only these 
+        data sources can be equal to goal_data, or be shrinked into goal_data (see Data.shrink()). The list is
+        computed once per goal and kept in self.memo.
+        """
+        key = ("goal_candidates", goal_data.fingerprint())
+        if key not in self.memo:
+            self.memo[key] = [d for d in self.set_of_sources if self._is_goal_candidate(d, goal_data)]
+        return self.memo[key]
+
+    def _is_goal_candidate(self, d: Data, goal_data: Data):
+        return (goal_data.left_variables.issubset(d.left_variables) and 
+                goal_data.right_variables.issubset(d.right_variables))
+
     def contains_variables_only(self, data_set: Data):
         # Same as contains() except here, we do NOT care about the context 
         # This is used for some models
@@ -178,6 +247,45 @@ class SetOfSources:
             self.score = max((d.similarity(goal_data, variant=variant) for d in self.set_of_sources)) * np.mean(list(d.similarity(goal_data, variant=variant) for d in self.set_of_sources)) * min((goal_data.similarity(d, variant=variant) for d in self.set_of_sources))
         return self.score 
     
+    def similarity_incremental(self, goal_data: Data, similarity_choice="sum", multiplier=3, variant="base", prints=False):
+        """
+        Gives the same score as similarity_<similarity_choice>(), for the choices in INCREMENTAL_CHOICES, but 
+        derives it from running aggregates of the scores of the data sources (see ScoreAggregates). For a set of 
+        sources created by branch(), the aggregates follow from those of the parent and the score of the one 
+        added data source, so the score is found without looping over all data sources.
+        """
+        if not self.score:
+            aggregates = self.get_score_aggregates(goal_data, similarity_choice, multiplier=multiplier, variant=variant,
+                                                   prints=prints)
+            self.score = aggregates.get(similarity_choice)
+        return self.score
+
+    def get_score_aggregates(self, goal_data: Data, similarity_choice, multiplier=3, variant="base", prints=False):
+        # running aggregates of the scores of all data sources, computed once and kept in self.memo
+        key = self._score_aggregates_key(goal_data, similarity_choice, multiplier, variant)
+        if key not in self.memo:
+            self.memo[key] = ScoreAggregates.from_scores(
+                (self._source_score(d, goal_data, similarity_choice, variant, prints) for d in self.set_of_sources),
+                n_top=key[-1])
+        return self.memo[key]
+
+    def _score_aggregates_key(self, goal_data: Data, similarity_choice, multiplier, variant):
+        if similarity_choice == "topsum":
+            # number of highest scores to keep, see similarity_topsum()
+            n_top = multiplier*(len(goal_data.left_variables) + len(goal_data.right_variables))
+        else:
+            n_top = None
+        return ("score_aggregates", similarity_choice, goal_data.fingerprint(), variant, n_top)
+
+    def _source_score(self, d: Data, goal_data: Data, similarity_choice, variant, prints):
+        # score of a single data source, exactly as it is used by the similarity_<similarity_choice>() method
+        if similarity_choice == "sum":
+            return goal_data.similarity(d, variant=variant)
+        elif similarity_choice == "topsum":
+            return d.similarity(goal_data, variant=variant, prints=prints)
+        else:
+            return d.similarity(goal_data, variant=variant)
+
     def similarity_max_per_variable(self, goal_data: Data, variant="base"):  
         if not self.score: 
             idx = 0
@@ -304,3 +412,162 @@ class SetOfSources:
                             all_path_steps.append(path_step_tmp)
 
         return all_neighbours, all_path_steps
+
+    def get_neighbours_lazy(self, goal_data: Data, agg = True):
+        """
+        Generator of the same (Data, Step) neighbours as get_neighbours(), the most promising first, so the A* search
+        can stop taking neighbours before all of them are created (a data source is only copied when its neighbour 
+        is taken). The conversions and aggregations are ordered by Data.move_relevance(), then by the number of 
+        variables that the data source shares with goal_data. Combinations are left out: get_neighbours() returns 
+        them without a path step, so the A* search never uses them.
+        """
+        goal_names = {v.name for v in goal_data.left_variables | goal_data.right_variables}
+        moves = []
+        for d in self.set_of_sources:
+            shared = len({v.name for v in d.left_variables | d.right_variables} & goal_names)
+            moves += [(d.move_relevance(move, goal_data), shared, d, move) for move in d.neighbour_moves(agg)]
+
+        seen = {}
+        # sorted() is stable, so moves with the same relevance keep the order of get_neighbours()
+        for _, _, d, move in sorted(moves, key=lambda m: (-m[0], -m[1])):
+            neighbour, path_step = d.apply_move(move)
+            if _first_seen(seen, neighbour):
+                yield neighbour, path_step
+
+    def get_neighbours_models_lazy(self, goal_data: Data, models=None):
+        """
+        Generator of the same (Data, Step) neighbours as get_neighbours_models(), the most promising models first:
+        the models whose output data has the most variables of goal_data. A model is only applied to the data 
+        sources when its neighbours are taken.
+        """
+        if models is None:
+            return
+
+        goal_variables = goal_data.left_variables | goal_data.right_variables
+
+        def relevance(model_tmp):
+            outputs = model_tmp.output_data if isinstance(model_tmp.output_data, list) else [model_tmp.output_data]
+            return max((len((o.left_variables | o.right_variables) & goal_variables) for o in outputs), default=0)
+
+        seen = {}
+        for model_tmp in sorted(models, key=lambda m: -relevance(m)):
+            n_input = len(model_tmp.input_data)
+            for dataset_selection in itertools.combinations(self.set_of_sources, n_input):
+                if model_output := model_tmp.apply(potential_input=list(dataset_selection)):
+                    for mo in model_output:
+                        if _first_seen(seen, mo):
+                            yield mo, Step("model", model_tmp.name, model_tmp.input_data, mo)
+
+
+def _first_seen(seen, d: Data):
+    # True the first time that d (or an equal data set) is seen, seen maps fingerprints to the data sets seen so far
+    bucket = seen.setdefault(d.fingerprint(), [])
+    if d in bucket:
+        return False
+    bucket.append(d)
+    return True
+
+
+class SetOfSourcesChild(SetOfSources):
+    """
+    Persistent variant of SetOfSources, created by SetOfSources.branch(). It only stores the difference with its 
+    parent set of sources: the added data source, the path step(s) and the iteration. The data sources, path and 
+    tree of the parent are shared, not copied, so creating a child takes O(1) memory. The full set_of_sources, path
+    and tree are only put together when they are used, and are then kept.
+
+    The parent should not be changed after a child was created (in the A* search, a set of sources is only changed 
+    by contains_shrink(), before its neighbours are created).
+    """
+
+    def __init__(self, parent: SetOfSources, data_new: Data, path_step=Step(), iteration="-1"):
+        self.parent = parent
+        self.data_new = data_new
+        self.path_step = path_step
+        self.iteration = iteration
+        self.score = False
+        self._fingerprint = None
+        self.memo = {}
+        self._set_of_sources = None
+        self._path = None
+        self._tree = None
+        self._modified = False  # True once the set of sources is changed (then it no longer follows from the parent)
+        self._adds_source = None  # cached by adds_source()
+
+    @property
+    def set_of_sources(self):
+        if self._set_of_sources is None:
+            self._set_of_sources = self.parent.set_of_sources.union({self.data_new})
+        return self._set_of_sources
+
+    @set_of_sources.setter
+    def set_of_sources(self, value):
+        self._set_of_sources = value
+        self._modified = True
+
+    def adds_source(self):
+        # False if data_new was already present in the parent, in which case the set of sources equals the parent set
+        if self._adds_source is None:
+            self._adds_source = self.data_new not in self.parent.set_of_sources
+        return self._adds_source
+
+    @property
+    def path(self):
+        if self._path is None:
+            # path_step may be a list of path steps or a single path step (see add_to_path())
+            if isinstance(self.path_step, list):
+                self._path = self.parent.path + self.path_step
+            else:
+                self._path = self.parent.path + [self.path_step]
+        return self._path
+
+    @path.setter
+    def path(self, value):
+        self._path = value
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = self.parent.tree + [self.iteration]
+        return self._tree
+
+    @tree.setter
+    def tree(self, value):
+        self._tree = value
+
+    def fingerprint(self):
+        # As long as the set of sources was not changed, the fingerprint follows from the fingerprint of the parent,
+        # without putting together the full set of sources.
+        if self._fingerprint is None and not self._modified:
+            if not self.adds_source():
+                # adding a data source that was already present does not change the set
+                self._fingerprint = self.parent.fingerprint()
+            else:
+                self._fingerprint = (self.parent.fingerprint() + self.data_new.fingerprint()) & FINGERPRINT_MASK
+        return super().fingerprint()
+
+    def get_score_aggregates(self, goal_data: Data, similarity_choice, multiplier=3, variant="base", prints=False):
+        # As long as the set of sources was not changed, the aggregates follow from those of the parent (if the 
+        # parent was scored in the same way) and the score of the added data source.
+        key = self._score_aggregates_key(goal_data, similarity_choice, multiplier, variant)
+        if key not in self.memo and not self._modified and key in self.parent.memo:
+            aggregates_parent = self.parent.memo[key]
+            if not self.adds_source():
+                # adding a data source that was already present does not change the set
+                self.memo[key] = aggregates_parent
+            else:
+                self.memo[key] = aggregates_parent.add(
+                    self._source_score(self.data_new, goal_data, similarity_choice, variant, prints))
+        return super().get_score_aggregates(goal_data, similarity_choice, multiplier=multiplier, variant=variant, 
+                                            prints=prints)
+
+    def goal_candidates(self, goal_data: Data):
+        # As long as the set of sources was not changed, the goal candidates follow from those of the parent (if
+        # they were determined for the parent) and the added data source.
+        key = ("goal_candidates", goal_data.fingerprint())
+        if key not in self.memo and not self._modified and key in self.parent.memo:
+            candidates_parent = self.parent.memo[key]
+            if self.adds_source() and self._is_goal_candidate(self.data_new, goal_data):
+                self.memo[key] = candidates_parent + [self.data_new]
+            else:
+                self.memo[key] = candidates_parent
+        return super().goal_candidates(goal_data)
@@ -0,0 +1,218 @@
+"""
+Vectorised version of Data.similarity(). Each data source is encoded once, by the columns of its left- and
+right-hand variables (and variable names) in a growing universe of all variables that were seen so far. The scores
+of a whole batch of data sources against the goal then follow from a few matrix operations, instead of Python set
+intersections for every data source. score_sets() uses this to score a whole list of sets of sources in one call.
+"""
+
+import numpy as np
+
+# similarity score functions of SetOfSources that can be computed from the scores of the individual data sources
+ENGINE_CHOICES = ["sum", "topsum", "max", "mean", "median", "min", "minmax", "maxmean", "maxmeanmin"]
+
+
+class SimilarityEngine:
+    """
+    Computes the same scores as Data.similarity() (for the variants base, base_coupled, individual, normalized and
+    normalized_coupled), for a batch of data sources at once. The weights are fixed per engine and have the same
+    defaults as Data.similarity().
+
+    The encodings and the comparisons of sets of included units are kept for later calls, at most max_cache_size of
+    each (when there are more, they are forgotten and computed again when needed).
+
+    Note that the engine always scores a data source against the goal. SetOfSources.similarity_sum() (and the
+    minimum in similarity_maxmeanmin()) call goal.similarity(d) instead, which reuses the score cached in the goal,
+    so those two similarity choices can give different values with the engine.
+    """
+
+    def __init__(self, weight_right_sim=1, weight_right_eq=5, weight_left_sim=2, weight_left_eq=5, weight_units=5,
+                 max_cache_size=100000):
+        self.weight_right_sim = weight_right_sim
+        self.weight_right_eq = weight_right_eq
+        self.weight_left_sim = weight_left_sim
+        self.weight_left_eq = weight_left_eq
+        self.weight_units = weight_units
+        self.max_cache_size = max_cache_size
+
+        self.variable_ids = {}  # (name, granularity) -> column in the variable universe
+        self.name_ids = {}  # variable name -> column in the universe of variable names
+        self.encodings = {}  # (left variables, right variables) -> encoding of the variables, see encode()
+        self.units_equal = {}  # (id(set_of_units), id(goal set_of_units)) -> (set_of_units, goal set_of_units, equal)
+
+    def _variable_id(self, v):
+        return self.variable_ids.setdefault((v.name, v.granularity), len(self.variable_ids))
+
+    def _name_id(self, name):
+        return self.name_ids.setdefault(name, len(self.name_ids))
+
+    def encode(self, d):
+        """
+        Returns the columns of the left variables, left variable names, right variables and right variable names of
+        data source d (as four arrays of integers). Computed once per combination of left- and right-hand variables.
+        """
+        # keyed by the variables themselves (not by the fingerprint), so data sources with different variables can never
+        # share an encoding
+        key = (frozenset(d.left_variables), frozenset(d.right_variables))
+        if key not in self.encodings:
+            self.encodings[key] = (
+                np.array([self._variable_id(v) for v in d.left_variables], dtype=np.intp),
+                np.array(sorted({self._name_id(v.name) for v in d.left_variables}), dtype=np.intp),
+                np.array([self._variable_id(v) for v in d.right_variables], dtype=np.intp),
+                np.array(sorted({self._name_id(v.name) for v in d.right_variables}), dtype=np.intp))
+        return self.encodings[key]
+
+    def _limit_caches(self):
+        if len(self.encodings) > self.max_cache_size:
+            self.encodings.clear()
+        if len(self.units_equal) > self.max_cache_size:
+            self.units_equal.clear()
+
+    def score_inputs(self, d, goal):
+        """
+        Everything that the score of data source d depends on (for a given goal, variant and weights): its variables,
+        and whether its set of included units equals that of the goal. Data sources with the same score inputs have
+        the same score.
+        """
+        return frozenset(d.left_variables), frozenset(d.right_variables), self._units_equal(d, goal)
+
+    def _units_equal(self, d, goal):
+        # comparing sets of included units is expensive, so remember the result per pair of objects
+        # (the objects are kept in the dictionary, so their id's cannot be reused)
+        key = (id(d.set_of_units), id(goal.set_of_units))
+        if key not in self.units_equal:
+            self.units_equal[key] = (d.set_of_units, goal.set_of_units, d.set_of_units == goal.set_of_units)
+        return self.units_equal[key][2]
+
+    def _matrix(self, encodings, position, n_columns):
+        # 0/1 matrix with a row per data source and a column per variable (or variable name)
+        matrix = np.zeros((len(encodings), n_columns), dtype=np.int64)
+        columns = [encoding[position] for encoding in encodings]
+        rows = np.repeat(np.arange(len(encodings)), [len(c) for c in columns])
+        if len(rows) > 0:
+            matrix[rows, np.concatenate(columns)] = 1
+        return matrix
+
+    def similarity(self, data_list, goal, variant="base"):
+        """
+        Returns an array with the similarity score of every data source in data_list with the goal, equal to
+        [d.similarity(goal, variant=variant) for d in data_list] (without the cached scores of Data.similarity()).
+        """
+        self._limit_caches()
+        encodings = [self.encode(d) for d in data_list]
+        goal_left, goal_left_names, goal_right, goal_right_names = self.encode(goal)
+        # columns of the names of each of the goal variables (in the same order as goal_left and goal_right)
+        goal_left_var_names = np.array([self._name_id(v.name) for v in goal.left_variables], dtype=np.intp)
+        goal_right_var_names = np.array([self._name_id(v.name) for v in goal.right_variables], dtype=np.intp)
+
+        n_variables = len(self.variable_ids)
+        n_names = len(self.name_ids)
+        left = self._matrix(encodings, 0, n_variables)
+        left_names = self._matrix(encodings, 1, n_names)
+        right = self._matrix(encodings, 2, n_variables)
+        right_names = self._matrix(encodings, 3, n_names)
+
+        units_score = self.weight_units * np.array([self._units_equal(d, goal) for d in data_list], dtype=np.int64)
+
+        if variant == "individual":
+            # for every goal variable: an exact match, or else a match on variable name only
+            left_exact = left[:, goal_left]
+            left_similar = left_names[:, goal_left_var_names] * (1 - left_exact)
+            right_exact = right[:, goal_right]
+            right_similar = right_names[:, goal_right_var_names] * (1 - right_exact)
+
+            score = (self.weight_left_eq * left_exact.sum(axis=1) + self.weight_left_sim * left_similar.sum(axis=1) +
+                     self.weight_right_eq * right_exact.sum(axis=1) + self.weight_right_sim * right_similar.sum(axis=1) +
+                     units_score)
+            # penalize sources that have more variables in them
+            return score / (left.sum(axis=1) + right.sum(axis=1))
+
+        left_equal = left[:, goal_left].sum(axis=1)
+        right_equal = right[:, goal_right].sum(axis=1)
+        left_similar = left_names[:, goal_left_names].sum(axis=1) - left_equal  # remove double-counting
+        right_similar = right_names[:, goal_right_names].sum(axis=1) - right_equal  # remove double-counting
+
+        left_score = self.weight_left_eq * left_equal + self.weight_left_sim * left_similar
+        right_score = self.weight_right_eq * right_equal + self.weight_right_sim * right_similar + units_score
+        left_equal_max = len(goal_left)
+        right_equal_max = len(goal_right)
+
+        if variant == "base":
+            return left_score + right_score
+        elif variant == "base_coupled":
+            return left_score * right_score
+        elif variant == "normalized":
+            return (left_score + right_score) / (self.weight_left_eq * left_equal_max +
+                                                 self.weight_right_eq * right_equal_max + self.weight_units)
+        elif variant == "normalized_coupled":
+            return (left_score * right_score) / (self.weight_left_eq * left_equal_max *
+                                                 (self.weight_right_eq * right_equal_max + self.weight_units))
+        else:
+            print("No known similarity variant was chosen")
+            return False
+
+    def score_sets(self, similarity_choice, sets_of_sources, goal, variant="base", multiplier=3):
+        """
+        Returns the scores of all sets of sources in sets_of_sources, for one of the similarity choices in
+        ENGINE_CHOICES. All distinct data sources in the sets are scored in a single call to similarity().
+        """
+        # collect the distinct data sources of all sets (data sources with the same score inputs are scored once)
+        self._limit_caches()
+        inputs = {}  # id(data source) -> score inputs (the data sources are kept in the sets, so the id's are unique)
+        distinct_data = {}  # score inputs -> data source
+        for set_of_sources in sets_of_sources:
+            for d in set_of_sources.set_of_sources:
+                if id(d) not in inputs:
+                    inputs[id(d)] = self.score_inputs(d, goal)
+                    distinct_data.setdefault(inputs[id(d)], d)
+
+        data_scores = self.similarity(list(distinct_data.values()), goal, variant=variant)
+        if data_scores is False:
+            return False
+        score_lookup = dict(zip(distinct_data.keys(), data_scores))
+
+        n_select = n_top_scores(similarity_choice, goal, multiplier)
+        all_scores = []
+        for set_of_sources in sets_of_sources:
+            score = combine_scores(similarity_choice, 
+                                   np.array([score_lookup[inputs[id(d)]] for d in set_of_sources.set_of_sources]),
+                                   n_select)
+            if score is False:
+                return False
+            all_scores.append(score)
+
+        return all_scores
+
+
+def n_top_scores(similarity_choice, goal, multiplier=3):
+    # number of highest scores that "topsum" adds up (see SetOfSources.similarity_topsum()), None for other choices
+    if similarity_choice == "topsum":
+        return multiplier*(len(goal.left_variables) + len(goal.right_variables))
+    return None
+
+
+def combine_scores(similarity_choice, scores, n_select=None):
+    """
+    Score of a set of sources from the array with the scores of its data sources, for one of the similarity choices in
+    ENGINE_CHOICES (n_select: see n_top_scores()). Returns False for other similarity choices.
+    """
+    if similarity_choice == "sum":
+        return scores.sum()
+    elif similarity_choice == "topsum":
+        return np.sort(scores)[-n_select:].sum()
+    elif similarity_choice == "max":
+        return scores.max()
+    elif similarity_choice == "mean":
+        return scores.mean()
+    elif similarity_choice == "median":
+        return np.median(scores)
+    elif similarity_choice == "min":
+        return scores.min()
+    elif similarity_choice == "minmax":
+        return scores.max() * scores.min()
+    elif similarity_choice == "maxmean":
+        return scores.max() + scores.mean()
+    elif similarity_choice == "maxmeanmin":
+        return scores.max() * scores.mean() * scores.min()
+    else:
+        print("No known similarity score option was chosen")
+        return False
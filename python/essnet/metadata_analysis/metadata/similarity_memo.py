@@ -0,0 +1,133 @@
+"""
+Memo table of the similarity scores of data sources. Data.similarity() keeps the score in the data source itself,
+whatever goal, variant and weights it was computed for, and the search makes a (deep) copy of every data source that
+it changes, so the same data source is scored again in every set of sources that contains a copy of it. The memo
+keeps the scores by the contents of the data source and of the goal (see data_key()), the variant and the weights
+instead, so each distinct data source is scored once per goal, and can be shared by searches (for example by all
+goals of a_star_batch()). At most max_size scores are kept: when the memo is full, the least recently used score is
+forgotten.
+
+Like the SimilarityEngine, the memo always scores a data source against the goal, so the "sum" and "maxmeanmin"
+similarity choices can give other values than without it (see SimilarityEngine).
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from metadata_analysis.metadata.set_of_included_units import units_key
+from metadata_analysis.metadata.similarity_engine import n_top_scores, combine_scores
+
+# weights of Data.similarity(), in the order of its parameters: weight_right_sim, weight_right_eq, weight_left_sim,
+# weight_left_eq, weight_units
+DEFAULT_WEIGHTS = (1, 5, 2, 5, 5)
+
+
+def data_key(d):
+    """
+    Key of a data source in the memo: its left- and right-hand variables and the contents of its set of included
+    units. Unlike the fingerprint, the key is compared with == in the memo, so different data sources never share a
+    score (data sources with equal but differently described sets of included units are scored separately).
+    """
+    return frozenset(d.left_variables), frozenset(d.right_variables), units_key(d.set_of_units)
+
+
+def engine_weights(engine):
+    # the weights of a SimilarityEngine, in the order of DEFAULT_WEIGHTS
+    return (engine.weight_right_sim, engine.weight_right_eq, engine.weight_left_sim, engine.weight_left_eq,
+            engine.weight_units)
+
+
+class SimilarityMemo:
+    """
+    Least recently used table of similarity scores, keyed by (data key, goal key, variant, weights), see data_key().
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.table = OrderedDict()  # scores in order of last use
+        self.hits = 0
+        self.misses = 0
+        self.n_evicted = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def _get(self, key):
+        # returns (True, score) if the score is in the memo, (False, None) otherwise
+        if key not in self.table:
+            return False, None
+        self.table.move_to_end(key)
+        self.hits += 1
+        return True, self.table[key]
+
+    def _add(self, key, score):
+        self.table[key] = score
+        self.table.move_to_end(key)
+        while len(self.table) > self.max_size:
+            # forget the least recently used score
+            self.table.popitem(last=False)
+            self.n_evicted += 1
+
+    def similarity(self, d, goal, variant="base", weight_right_sim=1, weight_right_eq=5, weight_left_sim=2,
+                   weight_left_eq=5, weight_units=5):
+        # the same score as d.similarity(goal, ...) for a data source without a kept score
+        weights = (weight_right_sim, weight_right_eq, weight_left_sim, weight_left_eq, weight_units)
+        key = (data_key(d), data_key(goal), variant, weights)
+        found, score = self._get(key)
+        if not found:
+            self.misses += 1
+            score = d.similarity_score(goal, variant, *weights)
+            self._add(key, score)
+        return score
+
+    def score_sets(self, similarity_choice, sets_of_sources, goal, variant="base", multiplier=3, engine=None):
+        """
+        Returns the scores of all sets of sources in sets_of_sources, for one of the similarity choices in
+        ENGINE_CHOICES. Data sources that are not in the memo are scored with Data.similarity_score() and the default
+        weights, or, with an engine (SimilarityEngine), in a single call to the engine (with the weights of the
+        engine).
+        """
+        weights = DEFAULT_WEIGHTS if engine is None else engine_weights(engine)
+        goal_key = data_key(goal)
+
+        # look up the distinct data sources of all sets
+        keys = {}  # id(data source) -> data key (the data sources are kept in the sets, so the id's are unique)
+        score_lookup = {}  # data key -> score
+        missing = {}  # data key -> data source that is not in the memo
+        for set_of_sources in sets_of_sources:
+            for d in set_of_sources.set_of_sources:
+                if id(d) in keys:
+                    continue
+                key = keys[id(d)] = data_key(d)
+                if key in score_lookup or key in missing:
+                    continue
+                found, score = self._get((key, goal_key, variant, weights))
+                if found:
+                    score_lookup[key] = score
+                else:
+                    missing[key] = d
+
+        if missing:
+            self.misses += len(missing)
+            if engine is None:
+                scores = [d.similarity_score(goal, variant, *weights) for d in missing.values()]
+            else:
+                scores = engine.similarity(list(missing.values()), goal, variant=variant)
+                if scores is False:
+                    return False
+            for key, score in zip(missing.keys(), scores):
+                score_lookup[key] = score
+                self._add((key, goal_key, variant, weights), score)
+
+        n_select = n_top_scores(similarity_choice, goal, multiplier)
+        all_scores = []
+        for set_of_sources in sets_of_sources:
+            score = combine_scores(similarity_choice,
+                                   np.array([score_lookup[keys[id(d)]] for d in set_of_sources.set_of_sources]),
+                                   n_select)
+            if score is False:
+                return False
+            all_scores.append(score)
+
+        return all_scores
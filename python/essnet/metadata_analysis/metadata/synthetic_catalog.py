@@ -0,0 +1,156 @@
+"""
+# Synthetic catalogs
+Generates catalogs of data sources of any size, for scaling tests and benchmarks of the search. A catalog consists
+of variables with a ConversionGraph and an AggregationGraph, AggregationTables for all aggregation edges, sets of
+included units (with specifying variables), data sources and models, and comes with a goal that can be reached
+from the data sources. The same seed always gives the same catalog.
+
+The granularities of a variable are ordered in levels (0 is the most detailed): aggregation edges go from each
+granularity to one or more granularities of the next level, conversion edges connect granularities of the same
+level. The goal is made by a random walk from one of the data sources: conversions and aggregations (as found by
+Data.get_neighbours()), followed by dropping some of the left-hand side variables (see 
+SetOfSources.contains_shrink()), so the search can reach it in the same steps.
+
+The graphs and tables are kept globally (see AggregationGraph.instances), so generate_catalog() removes all
+existing graphs and tables first.
+"""
+
+import random
+
+from metadata_analysis.metadata.aggregation import AggregationGraph, AggregationTable
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.model import Model
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.test_case import TestCase
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.metadata.variable_spec import VariableSpec
+
+
+def _granularities(depth, branching):
+    # granularities per level: level k has branching granularities, numbered k * branching + j
+    return [[level * branching + j for j in range(branching)] for level in range(depth + 1)]
+
+
+def _values(granularity, level, depth, value_cardinality):
+    # values of a granularity, the most detailed level has the most values
+    return [str(granularity) + "_" + str(k) for k in range(value_cardinality * (depth - level + 1))]
+
+
+def _random_variables(rng, names, levels, n):
+    # n variables with different names, each at a random granularity
+    return [Variable(name, rng.choice(rng.choice(levels))) for name in rng.sample(names, min(n, len(names)))]
+
+
+def generate_catalog(n_sources=50, n_variables=10, depth=3, branching=2, value_cardinality=3, n_unit_types=2,
+                     n_sets_of_units=6, n_models=5, max_left=3, max_right=2, goal_steps=3, seed=0):
+    """
+    Generates a catalog and returns a TestCase with the goal, the start set (a SetOfSources with n_sources data
+    sources) and the models.
+
+    n_variables: number of variables, each with depth + 1 levels of branching granularities
+    value_cardinality: number of values of the least detailed granularities in the AggregationTables (each more
+        detailed level has value_cardinality more values)
+    n_unit_types, n_sets_of_units: unit types and sets of included units (some with specifying variables)
+    max_left, max_right: maximum number of left-hand and right-hand side variables of a data source
+    goal_steps: number of conversions and aggregations in the random walk to the goal
+    """
+    rng = random.Random(seed)
+
+    # remove the graphs and tables of earlier catalogs (or cases)
+    AggregationGraph.instances.clear()
+    ConversionGraph.instances.clear()
+    AggregationTable.instances.clear()
+
+    levels = _granularities(depth, branching)
+    names = ["v" + str(k) for k in range(n_variables)]
+    values = {}  # (variable name, granularity) -> list of values
+
+    for name in names:
+        aggregation_edges = []
+        conversion_edges = [(g, g) for g in levels[0]]
+        for level in range(depth):
+            for g in levels[level]:
+                # each granularity can be aggregated to at least one granularity of the next level
+                for g_to in rng.sample(levels[level + 1], rng.randint(1, branching)):
+                    aggregation_edges.append((g, g_to))
+            for g1, g2 in zip(levels[level], levels[level][1:]):
+                if rng.random() < 0.5:
+                    conversion_edges.append((g1, g2))
+
+        granularities = [g for level in levels for g in level]
+        ConversionGraph(variable_name=name, granularities=granularities, conversion_edges=conversion_edges)
+        AggregationGraph(variable_name=name, granularities=granularities, aggregation_edges=aggregation_edges)
+
+        for level, level_granularities in enumerate(levels):
+            for g in level_granularities:
+                values[(name, g)] = _values(g, level, depth, value_cardinality)
+
+        for g_from, g_to in aggregation_edges:
+            # each value of g_to is made from one or more values of g_from (every value of g_from is used once)
+            values_from = values[(name, g_from)]
+            values_to = values[(name, g_to)]
+            value_map = {value: set() for value in values_to}
+            for k, value in enumerate(rng.sample(values_from, len(values_from))):
+                value_map[values_to[k % len(values_to)]].add(value)
+            AggregationTable(variable_name=name, granularity_from=g_from, granularity_to=g_to, value_map=value_map)
+
+    # sets of included units: the complete population of each unit type, and subsets with specifying variables (at
+    # the most detailed granularity, so they can be compared without chaining aggregation tables)
+    unit_types = [Variable("u" + str(k), 0) for k in range(n_unit_types)]
+    sets_of_units = [SetOfIncludedUnits(name="U" + str(k), unit_type_var=u) for k, u in enumerate(unit_types)]
+    for k in range(n_sets_of_units):
+        specifying_variables = []
+        for name in rng.sample(names, rng.randint(1, 2)):
+            g = levels[0][0]
+            available = values[(name, g)]
+            specifying_variables.append(VariableSpec(name, g, set(rng.sample(available, rng.randint(1, len(available))))))
+        sets_of_units.append(SetOfIncludedUnits(name="S" + str(k), unit_type_var=rng.choice(unit_types),
+                                                specifying_variables=specifying_variables))
+
+    sources = []
+    for k in range(n_sources):
+        n_right = rng.randint(1, max_right)
+        n_left = rng.randint(1, max_left)
+        variables = _random_variables(rng, names, levels, n_right + n_left)
+        sources.append(Data(left_variables=variables[n_right:], right_variables=variables[:n_right],
+                            set_of_units=rng.choice(sets_of_units), name="source " + str(k)))
+
+    models = []
+    for k in range(n_models):
+        # a model takes (part of the variables of) one or two data sources, and gives a new data source
+        inputs = []
+        for source in rng.sample(sources, rng.randint(1, 2)):
+            inputs.append(Data(left_variables=rng.sample(sorted(source.left_variables, key=str),
+                                                         rng.randint(1, len(source.left_variables))),
+                               right_variables=source.right_variables, set_of_units=source.set_of_units,
+                               name="model " + str(k) + " input"))
+        n_right = rng.randint(1, max_right)
+        variables = _random_variables(rng, names, levels, n_right + rng.randint(1, max_left))
+        model = Model(input_data=inputs,
+                      output_data=Data(left_variables=variables[n_right:], right_variables=variables[:n_right],
+                                       set_of_units=inputs[0].set_of_units, name="model " + str(k) + " output"),
+                      units_rule=rng.choice(["exact", "intersection", "equal"]))
+        model.name = "model " + str(k)
+        models.append(model)
+
+    goal = _reachable_goal(rng, sources, goal_steps)
+
+    return TestCase(goal=goal, start_set=SetOfSources(sources), models=models)
+
+
+def _reachable_goal(rng, sources, goal_steps):
+    # random walk from one of the data sources (sorted by str(), so the walk does not depend on the order of sets)
+    current = rng.choice(sources)
+    for _ in range(goal_steps):
+        neighbours, _ = current.get_neighbours(agg=True)
+        if not neighbours:
+            break
+        current = rng.choice(sorted(neighbours, key=str))
+
+    # drop some of the left-hand side variables (the search finds the goal with contains_shrink())
+    left = sorted(current.left_variables, key=str)
+    goal_left = rng.sample(left, rng.randint(1, len(left)))
+    return Data(left_variables=goal_left, right_variables=current.right_variables, set_of_units=current.set_of_units,
+                name="goal")
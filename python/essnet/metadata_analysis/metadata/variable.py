@@ -20,4 +20,8 @@ class Variable:
         return(hash(str(self)))
     
     def equal_name(self, other: "Variable"):
-        return self.name == other.name
\ No newline at end of file
+        return self.name == other.name
+
+    def with_granularity(self, granularity):
+        # the same variable at another granularity (of the same class, see interned_variable.py)
+        return Variable(name=self.name, granularity=granularity)
@@ -119,7 +119,7 @@ class VariableSpec(Variable):
             # In case of matching granularities: all we need to do is keep the intersection of the available values
             return VariableSpec(name = self.name,
                                 granularity=self.granularity,
-                                value_available=self.value_available.intersection(other.value_available))
+                                value_available=set(self.value_available).intersection(other.value_available))
         
         # In case of non-matching granularities: we need to check if aggregation is possible between the values of these granularities, 
         # along a path with specified aggregation tables. We may need a chained aggregation table. 
@@ -170,7 +170,7 @@ class VariableSpec(Variable):
             # In case of matching granularities: all we need to do is determine the union of the available values
             return VariableSpec(name = self.name,
                                 granularity=self.granularity,
-                                value_available=self.value_available.union(other.value_available))
+                                value_available=set(self.value_available).union(other.value_available))
         
         # In case of non-matching granularities: we need to check if aggregation is possible between the values of these granularities, 
         # along a path with specified aggregation tables. We may need a chained aggregation table. 
@@ -197,7 +197,8 @@ class VariableSpec(Variable):
                 
         # We now know which of the two sets is smaller (spec_var_small), which is bigger (spec_var_big) and the aggregation table
         # between the two (agg_table) from spec_var_small to spec_var_big
-        result_value_available = copy.deepcopy(spec_var_small.value_available)
+        # (a set, also if the values of spec_var_small are a frozenset, see InternedVariableSpec)
+        result_value_available = set(copy.deepcopy(spec_var_small.value_available))
 
         # Loop over all values of the bigger set, and add their values (translated through the aggregation table) to the available set
         for val_available_big in spec_var_big.value_available:
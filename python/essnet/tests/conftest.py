@@ -0,0 +1,43 @@
+"""
+Tests of the metadata_analysis package. Run from python/essnet/ with: python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+# the package is used from python/essnet/ (as in the notebooks), it is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata_analysis.metadata.aggregation import AggregationGraph, AggregationTable  # noqa: E402
+from metadata_analysis.metadata.conversion import ConversionGraph  # noqa: E402
+from metadata_analysis.metadata.data import Data  # noqa: E402
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits  # noqa: E402
+from metadata_analysis.metadata.variable import Variable  # noqa: E402
+from metadata_analysis.metadata.variable_spec import VariableSpec  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clear_graphs():
+    # the graphs and tables are kept globally, so every test starts without them
+    AggregationGraph.instances.clear()
+    ConversionGraph.instances.clear()
+    AggregationTable.instances.clear()
+    yield
+    AggregationGraph.instances.clear()
+    ConversionGraph.instances.clear()
+    AggregationTable.instances.clear()
+
+
+@pytest.fixture
+def similarity_case():
+    # data sources d1, d2 and d3 and the goal. d1 and d2 have the same variables and the same name of their set of
+    # included units, but only d1 has the units of the goal.
+    units_goal = SetOfIncludedUnits("A", Variable("p", 0), {VariableSpec("r", 0, {"n1"})})
+    units_other = SetOfIncludedUnits("A", Variable("p", 0), {VariableSpec("r", 0, {"n2"})})
+    d1 = Data([Variable("x", 0)], [Variable("t", 0)], units_goal, name="d1")
+    d2 = Data([Variable("x", 0)], [Variable("t", 0)], units_other, name="d2")
+    d3 = Data([Variable("y", 0)], [Variable("t", 0)], units_goal, name="d3")
+    goal = Data([Variable("x", 0)], [Variable("t", 0)], units_goal, name="goal")
+    return [d1, d2, d3], goal
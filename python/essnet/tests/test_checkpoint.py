@@ -0,0 +1,18 @@
+import pytest
+
+from metadata_analysis.algorithms.a_star import a_star
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.variable import Variable
+
+
+def test_lazy_neighbours_cannot_be_checkpointed(tmp_path):
+    units = SetOfIncludedUnits("A", Variable("p", 0), set())
+    start_set = SetOfSources([Data([Variable("x", 0)], [Variable("t", 0)], units, name="source")])
+    goal = Data([Variable("y", 0)], [Variable("t", 0)], units, name="goal")
+    checkpoint = str(tmp_path / "search.checkpoint")
+    with pytest.raises(ValueError):
+        a_star(start_set, goal, [], 10, lazy_neighbours=2, checkpoint_path=checkpoint)
+    with pytest.raises(ValueError):
+        a_star(start_set, goal, [], 10, lazy_neighbours=2, resume_from=checkpoint)
@@ -0,0 +1,20 @@
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.frozen_data import FrozenData
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.metadata.variable_spec import VariableSpec
+
+
+def _data(name, *values, cls=Data):
+    units = SetOfIncludedUnits(name, Variable("p", 0), {VariableSpec("r", 0, set(values))})
+    return cls([Variable("x", 0)], [Variable("t", 0)], units, name="d")
+
+
+def test_equal_data_sets_have_the_same_fingerprint():
+    for cls in [Data, FrozenData]:
+        # the same units under another name
+        assert _data("A", "n1", cls=cls) == _data("B", "n1", cls=cls)
+        assert _data("A", "n1", cls=cls).fingerprint() == _data("B", "n1", cls=cls).fingerprint()
+        # other units under the same name
+        assert _data("A", "n1", cls=cls) != _data("A", "n2", cls=cls)
+        assert _data("A", "n1", cls=cls).fingerprint() != _data("A", "n2", cls=cls).fingerprint()
@@ -0,0 +1,43 @@
+import pytest
+
+from metadata_analysis.metadata.aggregation import AggregationGraph
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.frozen_data import FrozenData
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.metadata.variable_spec import VariableSpec
+
+
+def _units(*values):
+    return SetOfIncludedUnits("A", Variable("p", 0), {VariableSpec("r", 0, set(values))})
+
+
+def test_moves_return_new_frozen_data():
+    ConversionGraph(variable_name="x", granularities=[0, 1], conversion_edges=[(0, 1)])
+    AggregationGraph(variable_name="t", granularities=[0, 1], aggregation_edges=[(0, 1)])
+    d = FrozenData([Variable("x", 0)], [Variable("t", 0)], _units("n1"), name="d")
+
+    converted, step = d.apply_move(("conversion", Variable("x", 0), Variable("x", 1)))
+    assert converted is FrozenData([Variable("x", 1)], [Variable("t", 0)], _units("n1"))
+    assert step.input == [str(d)] and step.output == [str(converted)]
+    aggregated, _ = d.aggregated(Variable("t", 0), Variable("t", 1))
+    assert aggregated.right_variables == {Variable("t", 1)}
+    assert d.left_variables == {Variable("x", 0)} and d.right_variables == {Variable("t", 0)}
+
+    # the in place methods of Data can not be used
+    with pytest.raises(AttributeError):
+        d.convert_variable(Variable("x", 0), Variable("x", 1))
+    with pytest.raises(AttributeError):
+        d.aggregate_variable(Variable("t", 0), Variable("t", 1))
+
+
+def test_scores_are_kept_per_goal_contents(monkeypatch):
+    # the goals only differ in the values of the specifying variable of their set of included units
+    monkeypatch.setattr(Data, "fingerprint", lambda self: 0)
+    d = FrozenData([Variable("x", 0)], [Variable("t", 0)], _units("n1"), name="d")
+    goals = [Data([Variable("x", 0)], [Variable("t", 0)], _units(value), name="goal") for value in ["n1", "n2"]]
+    expected = [Data([Variable("x", 0)], [Variable("t", 0)], _units("n1")).similarity(goal) for goal in goals]
+    assert expected[0] != expected[1]
+    assert [d.similarity(goal) for goal in goals] == expected
+    assert [d.similarity(goal) for goal in goals] == expected
@@ -0,0 +1,36 @@
+import math
+
+import pytest
+
+from metadata_analysis.algorithms.a_star import a_star, get_scores
+from metadata_analysis.metadata.aggregation import AggregationGraph
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.model import Model
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.variable import Variable
+
+
+def _case():
+    # the goal (y | u) can only be reached with the model, which turns (x | t) into (y | u)
+    for name in ["x", "y", "t", "u"]:
+        ConversionGraph(variable_name=name, granularities=[0], conversion_edges=[(0, 0)])
+        AggregationGraph(variable_name=name, granularities=[0], aggregation_edges=[])
+    units = SetOfIncludedUnits("A", Variable("p", 0), set())
+    start_set = SetOfSources([Data([Variable("x", 0)], [Variable("t", 0)], units, name="source")])
+    model = Model(input_data=[Data([Variable("x", 0)], [Variable("t", 0)], units, name="input")],
+                  output_data=Data([Variable("y", 0)], [Variable("u", 0)], units, name="output"), units_rule="exact")
+    goal = Data([Variable("y", 0)], [Variable("u", 0)], units, name="goal")
+    return start_set, goal, [model]
+
+
+def test_admissible_scores_use_the_models():
+    start_set, goal, models = _case()
+    assert get_scores("admissible", [start_set], goal, models=models)[0] > -math.inf
+    assert get_scores("admissible", [start_set], goal, models=[])[0] == -math.inf
+    with pytest.raises(ValueError):
+        get_scores("admissible", [start_set], goal)
+
+    result = a_star(start_set, goal, models, 10, similarity_choice="admissible")
+    assert [step.method for step in result.path][1] == "model"
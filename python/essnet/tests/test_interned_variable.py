@@ -0,0 +1,95 @@
+import copy
+
+from metadata_analysis.algorithms.a_star import a_star
+from metadata_analysis.metadata.aggregation import AggregationGraph, AggregationTable
+from metadata_analysis.metadata.combining import combines
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.interned_variable import InternedVariable, InternedVariableSpec, intern_variables
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata import set_of_sources
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.metadata.variable_spec import VariableSpec
+
+
+def _region_graphs():
+    # region r: neighbourhoods (0) aggregate to municipalities (1), M1 = {n1, n2} and M2 = {n3}
+    ConversionGraph(variable_name="r", granularities=[0, 1], conversion_edges=[(0, 0), (1, 1)])
+    AggregationGraph(variable_name="r", granularities=[0, 1], aggregation_edges=[(0, 1)])
+    AggregationTable(variable_name="r", granularity_from=0, granularity_to=1,
+                     value_map={"M1": {"n1", "n2"}, "M2": {"n3"}})
+    for name in ["x", "y", "t"]:
+        ConversionGraph(variable_name=name, granularities=[0], conversion_edges=[(0, 0)])
+        AggregationGraph(variable_name=name, granularities=[0], aggregation_edges=[])
+
+
+def _combining_case():
+    # d1 and d2 overlap in neighbourhood n2 only, so they can be combined column-wise (intersection of the units, which
+    # intersects the specifying variables of both granularities), and d2 and d3 row-wise (union of the units)
+    persons = Variable("p", 0)
+    units_a = SetOfIncludedUnits("A", persons, {VariableSpec("r", 0, {"n2", "n3"})})
+    units_b = SetOfIncludedUnits("B", persons, {VariableSpec("r", 1, {"M1"})})
+    units_goal = SetOfIncludedUnits("A ∩ B", persons, {VariableSpec("r", 0, {"n2"})})
+    d1 = Data([Variable("x", 0)], [Variable("t", 0)], units_a, name="d1")
+    d2 = Data([Variable("y", 0)], [Variable("t", 0)], units_b, name="d2")
+    d3 = Data([Variable("y", 0)], [Variable("t", 0)], units_a, name="d3")
+    goal = Data([Variable("x", 0), Variable("y", 0)], [Variable("t", 0)], units_goal, name="goal")
+    return [d1, d2, d3, goal]
+
+
+def test_interned_variables_match_plain_variables():
+    v = InternedVariable("x", 1)
+    assert v is InternedVariable("x", 1)
+    assert v == Variable("x", 1) and Variable("x", 1) == v
+    assert {v} == {Variable("x", 1)}
+    assert copy.deepcopy(v) is v
+    assert v.with_granularity(2) is InternedVariable("x", 2)
+
+    s = InternedVariableSpec("r", 0, {"n1", "n2"})
+    assert s is InternedVariableSpec("r", 0, frozenset({"n2", "n1"}))
+    assert hash(s) == hash(VariableSpec("r", 0, {"n1", "n2"}))
+    assert str(s) == str(VariableSpec("r", 0, {"n1", "n2"}))
+
+
+def test_union_and_intersection_of_interned_specs_with_different_granularities():
+    _region_graphs()
+    small = InternedVariableSpec("r", 0, {"n3"})
+    big = InternedVariableSpec("r", 1, {"M1"})
+
+    union = small.union(big)
+    assert union is InternedVariableSpec("r", 0, {"n1", "n2", "n3"})
+    assert big.union(small) is union
+    assert small.union(VariableSpec("r", 1, {"M1"})) is union
+
+    intersection = InternedVariableSpec("r", 0, {"n2", "n3"}).intersection(big)
+    assert intersection is InternedVariableSpec("r", 0, {"n2"})
+
+    # plain results of interned values are mutable again
+    plain = VariableSpec.union(small, big)
+    assert isinstance(plain.value_available, set)
+    assert isinstance(VariableSpec.intersection(small, InternedVariableSpec("r", 0, {"n3"})).value_available, set)
+
+
+def test_combining_search_with_interned_variables(monkeypatch):
+    _region_graphs()
+    plain_case = _combining_case()
+    d1, d2, d3, goal = intern_variables(copy.deepcopy(plain_case))
+    assert all(isinstance(v, InternedVariableSpec) for v in d1.set_of_units.specifying_variables)
+
+    _, colwise = combines(d1, d2)
+    assert colwise.set_of_units == goal.set_of_units
+    rowwise, _ = combines(d2, d3)
+    assert rowwise.set_of_units.set_of_soiu == {d2.set_of_units, d3.set_of_units}
+
+    # the search combines the data sources in every expansion
+    n_combines = []
+
+    def counting_combines(data1, data2):
+        n_combines.append(1)
+        return combines(data1, data2)
+
+    monkeypatch.setattr(set_of_sources, "combines", counting_combines)
+    result = a_star(SetOfSources([d1, d2, d3]), goal, [], 10)
+    assert n_combines
+    assert result == a_star(SetOfSources(plain_case[:3]), plain_case[3], [], 10)
@@ -0,0 +1,27 @@
+from metadata_analysis.algorithms.parallel import ParallelExpander
+from metadata_analysis.metadata.aggregation import AggregationGraph
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.variable import Variable
+
+
+def test_neighbours_match_the_serial_neighbours_with_a_path_step():
+    ConversionGraph(variable_name="x", granularities=[0, 1], conversion_edges=[(0, 1)])
+    AggregationGraph(variable_name="x", granularities=[0, 1], aggregation_edges=[])
+    ConversionGraph(variable_name="t", granularities=[0, 1], conversion_edges=[])
+    AggregationGraph(variable_name="t", granularities=[0, 1], aggregation_edges=[(0, 1)])
+    units = SetOfIncludedUnits("A", Variable("p", 0), set())
+    # the two data sources can be combined rowwise
+    set_of_sources = SetOfSources([Data([Variable("x", 0)], [Variable("t", 0)], units, name="d1"),
+                                   Data([Variable("x", 0)], [Variable("t", 0)],
+                                        SetOfIncludedUnits("B", Variable("p", 0), set()), name="d2")])
+    serial = set_of_sources.get_neighbours()
+    assert len(serial[0]) > len(serial[1])  # the combinations have no path step
+
+    with ParallelExpander(2) as expander:
+        parallel = expander.get_neighbours(set_of_sources)
+    assert len(parallel[0]) == len(parallel[1])
+    assert ([(str(d), s.method, s.method_detail) for d, s in zip(*parallel)] ==
+            [(str(d), s.method, s.method_detail) for d, s in zip(*serial)])
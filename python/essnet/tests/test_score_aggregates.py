@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from metadata_analysis.metadata.score_aggregates import ScoreAggregates
+
+
+def test_top_scores_of_shared_aggregates():
+    rng = random.Random(0)
+    n_top = 3
+    parent_scores = [rng.choice([0.5, 1.0, 1.5, 2.0]) for _ in range(5)]
+    parent = ScoreAggregates.from_scores(parent_scores, n_top=n_top)
+
+    # all children are derived from the same parent, which does not change
+    for _ in range(50):
+        child_scores = parent_scores + [rng.choice([0.0, 0.5, 1.0, 1.5, 2.0, 2.5])]
+        child = parent.add(child_scores[-1])
+        assert child.get("topsum") == pytest.approx(sum(sorted(child_scores)[-n_top:]))
+        assert (child.get("sum"), child.get("max"), child.get("min")) == (sum(child_scores), max(child_scores),
+                                                                        min(child_scores))
+        if child_scores[-1] <= min(sorted(parent_scores)[-n_top:]):
+            assert child.top is parent.top and child.get("topsum") == parent.get("topsum")
+    assert parent.get("topsum") == pytest.approx(sum(sorted(parent_scores)[-n_top:]))
+
+
+def test_top_scores_of_a_chain():
+    rng = random.Random(1)
+    for n_top in [1, 2, 5]:
+        scores = []
+        aggregates = ScoreAggregates(n_top=n_top)
+        for _ in range(40):
+            scores.append(rng.random())
+            aggregates = aggregates.add(scores[-1])
+            assert aggregates.get("topsum") == pytest.approx(sum(sorted(scores)[-n_top:]))
@@ -0,0 +1,52 @@
+import concurrent.futures
+import threading
+import time
+
+from metadata_analysis.algorithms import service
+from metadata_analysis.algorithms.service import SearchService
+
+REQUEST = {"goal": {"left_variables": [], "right_variables": [], "set_of_units": "any"}, "timeout": 0.05}
+
+
+def test_timed_out_search_keeps_its_slot_until_it_stops(monkeypatch):
+    search_service = SearchService("metadata_analysis.metadata.synthetic_catalog:generate_catalog", n_workers=1,
+                                   max_queue=0)
+    search_service.shutdown()
+    # a search that runs until it is stopped, in a thread instead of a worker process
+    search_service.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    stop = threading.Event()
+    monkeypatch.setattr(service, "_search", lambda *args: stop.wait(5) and {"status": "solved", "solutions": []})
+    monkeypatch.setattr(service, "TIMEOUT_GRACE", 0.05)
+    try:
+        assert search_service.search(REQUEST)[0] == 504
+        # the search is still running, so there is no free slot
+        assert search_service.search(REQUEST)[0] == 503
+        assert search_service.health()["active"] == 1
+
+        stop.set()
+        end = time.time() + 5
+        while search_service.health()["active"] and time.time() < end:
+            time.sleep(0.01)
+        assert search_service.health()["active"] == 0
+        assert search_service.search(REQUEST) == (200, {"status": "solved", "solutions": []})
+        assert search_service.health()["rejected"] == 1
+    finally:
+        stop.set()
+        search_service.shutdown()
+
+
+def test_invalid_request_frees_its_slot():
+    search_service = SearchService("metadata_analysis.metadata.synthetic_catalog:generate_catalog", n_workers=1,
+                                   max_queue=0)
+    try:
+        assert search_service.search({"goal": {}})[0] == 400
+        assert search_service.health()["active"] == 0
+        assert search_service.search({"goal": {}})[0] == 400
+    finally:
+        search_service.shutdown()
+
+
+def test_no_solutions_is_not_found():
+    for result in [False, []]:
+        assert service._result_to_json(result) == {"status": "not_found", "message": "No path was found.",
+                                                   "solutions": []}
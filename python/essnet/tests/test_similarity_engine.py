@@ -0,0 +1,31 @@
+import pytest
+
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.similarity_engine import SimilarityEngine
+from metadata_analysis.metadata.similarity_memo import SimilarityMemo
+
+
+@pytest.mark.parametrize("collide", [False, True])
+@pytest.mark.parametrize("scorer", [SimilarityEngine, SimilarityMemo])
+def test_sources_with_the_same_fingerprint_get_their_own_score(monkeypatch, similarity_case, collide, scorer):
+    sources, goal = similarity_case
+    if collide:
+        # all data sources (and the goal) have the same fingerprint
+        monkeypatch.setattr(Data, "fingerprint", lambda self: 0)
+    expected = [d.similarity_score(goal, "base") for d in sources]
+    assert expected[0] != expected[1]
+
+    if scorer is SimilarityEngine:
+        assert list(SimilarityEngine().similarity(sources, goal, variant="base")) == expected
+    else:
+        assert [SimilarityMemo().similarity(d, goal) for d in sources] == expected
+    assert scorer().score_sets("max", [SetOfSources([d]) for d in sources], goal, variant="base") == expected
+
+
+def test_caches_are_bounded(similarity_case):
+    sources, goal = similarity_case
+    engine = SimilarityEngine(max_cache_size=1)
+    for d in sources:
+        engine.similarity([d], goal)
+        assert len(engine.encodings) <= 2 and len(engine.units_equal) <= 2
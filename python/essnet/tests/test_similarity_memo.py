@@ -0,0 +1,29 @@
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.similarity_memo import SimilarityMemo
+from metadata_analysis.metadata.variable import Variable
+
+
+def test_scores_are_kept_per_data_source_and_goal(similarity_case):
+    sources, goal = similarity_case
+    memo = SimilarityMemo()
+    expected = [memo.similarity(d, goal) for d in sources]
+    assert memo.score_sets("max", [SetOfSources([d]) for d in sources], goal) == expected
+    assert (memo.misses, memo.hits) == (3, 3)
+
+    # the same score for another goal is not reused
+    other_goal = Data([Variable("y", 0)], [Variable("t", 0)], goal.set_of_units, name="other goal")
+    assert memo.similarity(sources[0], other_goal) == sources[0].similarity_score(other_goal, "base")
+    assert memo.misses == 4
+
+
+def test_least_recently_used_scores_are_forgotten(similarity_case):
+    sources, goal = similarity_case
+    memo = SimilarityMemo(max_size=2)
+    for d in sources:
+        memo.similarity(d, goal)
+    assert len(memo) == 2 and memo.n_evicted == 1
+    memo.similarity(sources[2], goal)
+    assert memo.hits == 1
+    memo.similarity(sources[0], goal)
+    assert memo.misses == 4
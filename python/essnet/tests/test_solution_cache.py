@@ -0,0 +1,107 @@
+import pytest
+
+from metadata_analysis.algorithms.solution_cache import SolutionCache
+from metadata_analysis.metadata.aggregation import AggregationGraph
+from metadata_analysis.metadata.conversion import ConversionGraph
+from metadata_analysis.metadata.data import Data
+from metadata_analysis.metadata.model import Model
+from metadata_analysis.metadata.path_step import Step
+from metadata_analysis.metadata.set_of_included_units import SetOfIncludedUnits
+from metadata_analysis.metadata.set_of_sources import SetOfSources
+from metadata_analysis.metadata.variable import Variable
+from metadata_analysis.metadata.variable_spec import VariableSpec
+
+
+def _case():
+    # the model turns (x | t) into (y | t), the goal is (y | t)
+    for name in ["x", "y", "t", "r"]:
+        ConversionGraph(variable_name=name, granularities=[0], conversion_edges=[(0, 0)])
+        AggregationGraph(variable_name=name, granularities=[0], aggregation_edges=[])
+    units = SetOfIncludedUnits("A", Variable("p", 0), {VariableSpec("r", 0, {"n1", "n2"})})
+    source = Data([Variable("x", 0)], [Variable("t", 0)], units, name="source")
+    model = Model(input_data=[Data([Variable("x", 0)], [Variable("t", 0)], units, name="input")],
+                  output_data=Data([Variable("y", 0)], [Variable("t", 0)], units, name="output"),
+                  units_rule="exact")
+    goal = Data([Variable("y", 0)], [Variable("t", 0)], units, name="goal")
+    return SetOfSources([source]), goal, [model], units
+
+
+def test_result_is_cached(tmp_path):
+    start_set, goal, models, _ = _case()
+    cache = SolutionCache(str(tmp_path))
+    first = cache.a_star(start_set, goal, models, 10)
+    second = cache.a_star(start_set, goal, models, 10)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [(s.method, s.method_detail) for s in second.path] == [(s.method, s.method_detail) for s in first.path]
+    assert len(first.path) > 1
+
+
+def test_changed_units_miss_the_cache(tmp_path):
+    start_set, goal, models, units = _case()
+    cache = SolutionCache(str(tmp_path))
+    key = cache.key(start_set, goal, models, 10)
+    assert cache.key(start_set, goal, models, 10) == key
+
+    # the same name, but other values of the specifying variable
+    units.specifying_variables = {VariableSpec("r", 0, {"n1"})}
+    key_values = cache.key(start_set, goal, models, 10)
+    assert key_values != key
+
+    # the same name, but another unit type
+    units.unit_type_var = Variable("q", 0)
+    assert cache.key(start_set, goal, models, 10) not in [key, key_values]
+
+    cache.a_star(start_set, goal, models, 10)
+    units.specifying_variables = {VariableSpec("r", 0, {"n2"})}
+    cache.a_star(start_set, goal, models, 10)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_changed_model_misses_the_cache(tmp_path):
+    start_set, goal, models, _ = _case()
+    cache = SolutionCache(str(tmp_path))
+    key = cache.key(start_set, goal, models, 10)
+
+    models[0].units_rule = "intersection"
+    key_rule = cache.key(start_set, goal, models, 10)
+    assert key_rule != key
+
+    models[0].coverage = 0.9  # any other attribute of the model
+    assert cache.key(start_set, goal, models, 10) not in [key, key_rule]
+
+    models[0]._cache = {"anything": 1}  # caches are not part of the key
+    models[0].coverage = 0.9
+    assert cache.key(start_set, goal, models, 10) == cache.key(start_set, goal, models, 10)
+    del models[0].coverage
+    assert cache.key(start_set, goal, models, 10) == key_rule
+
+
+def test_parameters_and_start_path_are_part_of_the_key(tmp_path):
+    start_set, goal, models, _ = _case()
+    cache = SolutionCache(str(tmp_path))
+    key = cache.key(start_set, goal, models, 10)
+    assert cache.key(start_set, goal, models, 10, incremental_scoring=True) != key
+
+    start_set.path = start_set.path + [Step("conversion", "x: 1→0", "", "")]
+    assert cache.key(start_set, goal, models, 10) != key
+
+
+class _Options:
+    def __init__(self, n):
+        self.n = n
+
+
+def test_values_are_described_by_their_contents(tmp_path):
+    start_set, goal, models, _ = _case()
+    cache = SolutionCache(str(tmp_path))
+    models[0].options = _Options(1)
+    key = cache.key(start_set, goal, models, 10)
+    models[0].options = _Options(1)
+    assert cache.key(start_set, goal, models, 10) == key
+    models[0].options = _Options(2)
+    assert cache.key(start_set, goal, models, 10) != key
+
+    # a value that only has its memory address
+    models[0].options = object()
+    with pytest.raises(ValueError):
+        cache.key(start_set, goal, models, 10)
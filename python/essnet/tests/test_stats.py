@@ -0,0 +1,32 @@
+from metadata_analysis.algorithms import stats as stats_module
+from metadata_analysis.algorithms.stats import SearchStats
+
+
+class _Clock:
+    # a perf_counter() that only moves when it is told to
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_phase_time_excludes_nested_phases(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(stats_module.time, "perf_counter", clock)
+    stats = SearchStats()
+    stats.start()
+    with stats.phase("lazy"):
+        clock.now += 1
+        with stats.phase("branching"):
+            clock.now += 2
+        with stats.phase("duplicates"):
+            clock.now += 3
+            with stats.phase("scoring"):
+                clock.now += 4
+    clock.now += 5
+    stats.stop()
+
+    assert stats.phase_time == {"lazy": 1, "branching": 2, "duplicates": 3, "scoring": 4}
+    assert stats.phase_calls == {"lazy": 1, "branching": 1, "duplicates": 1, "scoring": 1}
+    assert sum(stats.phase_time.values()) == stats.total_time() - 5